@@ -0,0 +1,98 @@
+"""Event loop lag under concurrent database load.
+
+Runs the same mix of slow reads and small writes with statements executed
+inline on the event loop (threaded=False, the old behaviour) and on the
+DataBase worker threads, while a ticker measures how late the loop wakes up.
+
+    python bench/db_loop_lag.py [--rows 200000] [--commands 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from cogs.utils.db import DataBase, DbType
+
+
+async def ticker(lags, stop, interval=0.005):
+    while not stop.is_set():
+        started = perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(perf_counter() - started - interval)
+
+
+async def command(db, guilds):
+    guild_id = random.randrange(guilds)
+
+    if random.random() < 0.2:
+        # the leaderboard query that used to be run on every balance
+        await db.execute(
+            "SELECT `member` FROM `money` WHERE `server` = ? ORDER BY `cash` + `bank` DESC",
+            guild_id, fetch_all=True)
+    else:
+        await db.execute(
+            "UPDATE `money` SET `cash` = `cash` + 1 WHERE `server` = ? AND `member` = ?",
+            guild_id, random.randrange(1000), with_commit=True)
+
+
+async def run(path, threaded, commands, guilds):
+    db = DataBase(DbType.SQLite, database=path, threaded=threaded, query_stats=False)
+    lags = []
+    stop = asyncio.Event()
+    tick = asyncio.ensure_future(ticker(lags, stop))
+
+    started = perf_counter()
+    await asyncio.gather(*(command(db, guilds) for _ in range(commands)))
+    elapsed = perf_counter() - started
+
+    stop.set()
+    await tick
+    await db.close()
+
+    lags.sort()
+
+    return elapsed, lags[len(lags) // 2], lags[int(len(lags) * 0.99)], lags[-1]
+
+
+def fill(path, rows, guilds):
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE `money` (`server` bigint, `member` bigint, `cash` bigint, `bank` bigint)")
+    conn.executemany("INSERT INTO `money` VALUES (?, ?, ?, ?)",
+        ((i % guilds, i // guilds, random.randrange(10 ** 6), random.randrange(10 ** 6))
+            for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--guilds", type=int, default=4)
+    parser.add_argument("--commands", type=int, default=200)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        fill(path, options.rows, options.guilds)
+
+        print(f"{options.commands} commands over {options.rows} money rows")
+        print(f"{'mode':<10}{'total s':>10}{'p50 lag ms':>13}{'p99 lag ms':>13}{'max lag ms':>13}")
+
+        for name, threaded in (("inline", False), ("threaded", True)):
+            random.seed(0)
+            elapsed, p50, p99, worst = asyncio.run(run(
+                path, threaded, options.commands, options.guilds))
+
+            print(f"{name:<10}{elapsed:>10.2f}{p50 * 1000:>13.1f}{p99 * 1000:>13.1f}{worst * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
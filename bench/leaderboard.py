@@ -0,0 +1,111 @@
+"""Compares the old SQL leaderboard place lookup with the in-memory ranking.
+
+Fills one guild of a temporary SQLite database with accounts, then times
+the ORDER BY query plus list.index that `get_place` used to run against
+the Leaderboard index: its first load, place lookups and money updates.
+
+    python bench/leaderboard.py [--accounts 100000] [--lookups 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from cogs.utils.db import DataBase, DbType
+from cogs.utils.leaderboard import Leaderboard
+from cogs.utils.migrations import MIGRATIONS
+
+
+GUILD_ID = 1
+
+SELECT_PLACE_SQL = """
+SELECT `member`
+FROM `money`
+WHERE `money`.`server` = ? AND `money`.`cash` + `money`.`bank` > 0
+ORDER BY `money`.`cash` + `money`.`bank` DESC
+"""
+
+
+async def fill(db, accounts):
+    await db.migrate(MIGRATIONS)
+    await db.executemany("INSERT INTO `money` VALUES (?, ?, ?, ?)",
+        [(GUILD_ID, member_id, random.randrange(10 ** 6), random.randrange(10 ** 6))
+            for member_id in range(accounts)],
+        with_commit=True)
+
+
+async def old_place(db, member_id):
+    all_accounts = await db.execute(SELECT_PLACE_SQL, GUILD_ID, fetch_all=True)
+    member_case = (member_id, )
+
+    if all_accounts is None or len(all_accounts) == 0 or member_case not in all_accounts:
+        return 1
+    return all_accounts.index(member_case) + 1
+
+
+def report(name, elapsed, count):
+    print(f"{name:<24}{elapsed * 1000 / count:>14.4f}{count / elapsed:>14.0f}")
+
+
+async def run(path, options):
+    random.seed(0)
+    db = DataBase(DbType.SQLite, database=path, query_stats=False)
+    await fill(db, options.accounts)
+
+    member_ids = [random.randrange(options.accounts) for _ in range(options.lookups)]
+
+    print(f"{options.accounts} accounts")
+    print(f"{'operation':<24}{'ms per op':>14}{'ops per s':>14}")
+
+    started = perf_counter()
+
+    for member_id in member_ids:
+        await old_place(db, member_id)
+
+    report("sql place", perf_counter() - started, len(member_ids))
+
+    leaderboard = Leaderboard(db)
+
+    started = perf_counter()
+    ranking = await leaderboard.get(GUILD_ID)
+    report("index load", perf_counter() - started, 1)
+
+    lookups = member_ids * (options.updates // len(member_ids) or 1)
+    started = perf_counter()
+
+    for member_id in lookups:
+        ranking.place(member_id)
+
+    report("index place", perf_counter() - started, len(lookups))
+
+    updates = [(random.randrange(options.accounts), random.randrange(2 * 10 ** 6))
+        for _ in range(options.updates)]
+    started = perf_counter()
+
+    for member_id, money_sum in updates:
+        leaderboard.update(GUILD_ID, member_id, money_sum)
+
+    report("index update", perf_counter() - started, len(updates))
+
+    await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=100000)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(os.path.join(directory, "bench.db"), options))
+
+
+if __name__ == "__main__":
+    main()
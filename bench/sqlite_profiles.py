@@ -0,0 +1,102 @@
+"""Replays a mix of bot statements against each SQLite profile.
+
+Every profile gets a fresh database file with the migrated schema and
+the same seeded data. Then the same pseudo random sequence of reads and
+writes runs through DataBase from concurrent "commands", and the script
+prints the wall time and per statement latency.
+
+    python bench/sqlite_profiles.py [--guilds 20] [--members 5000] [--statements 20000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from cogs.utils.db import DataBase, DbType
+from cogs.utils.migrations import MIGRATIONS
+
+
+# (weight, statement, argument factory, kwargs), roughly what a busy guild sends
+MIX = (
+    (30, "SELECT `cash`, `bank` FROM `money` WHERE `money`.`server` = ? AND `money`.`member` = ?",
+        lambda r, o: (r.randrange(o.guilds), r.randrange(o.members)), {}),
+    (25, "UPDATE `money` SET `cash` = `cash` + ? WHERE `money`.`server` = ? AND `money`.`member` = ?",
+        lambda r, o: (r.randrange(-50, 100), r.randrange(o.guilds), r.randrange(o.members)),
+        {"with_commit": True}),
+    (15, "SELECT `lang` FROM `langs` WHERE `langs`.`server` = ?",
+        lambda r, o: (r.randrange(o.guilds), ), {}),
+    (10, "SELECT `member`, `cash` + `bank` FROM `money` WHERE `money`.`server` = ? AND `cash` + `bank` > 0",
+        lambda r, o: (r.randrange(o.guilds), ), {"fetch_all": True}),
+    (10, "INSERT INTO `cases` VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        lambda r, o: (r.randrange(10 ** 6), r.randrange(o.guilds), 1, r.randrange(o.members),
+            "Warn", 0, "reason", 0),
+        {"with_commit": True}),
+    (10, "SELECT COUNT(*) FROM `cases` WHERE `cases`.`server` = ? AND `cases`.`member` = ?",
+        lambda r, o: (r.randrange(o.guilds), r.randrange(o.members)), {})
+)
+
+
+async def seed(db, options):
+    await db.migrate(MIGRATIONS)
+    await db.executemany("INSERT INTO `money` VALUES (?, ?, ?, ?)",
+        [(guild, member, random.randrange(10 ** 4), random.randrange(10 ** 4))
+            for guild in range(options.guilds) for member in range(options.members)],
+        with_commit=True)
+    await db.executemany("INSERT INTO `langs` VALUES (?, ?)",
+        [(guild, "en") for guild in range(options.guilds)], with_commit=True)
+
+
+async def replay(path, profile, options):
+    db = DataBase(DbType.SQLite, database=path, profile=profile, query_stats=False)
+    await seed(db, options)
+
+    rng = random.Random(1)
+    weights = [weight for weight, *_ in MIX]
+    plan = [rng.choices(MIX, weights)[0] for _ in range(options.statements)]
+    plan = [(sql, make_args(rng, options), kwargs) for _, sql, make_args, kwargs in plan]
+    latencies = []
+
+    async def command(statements):
+        for sql, args, kwargs in statements:
+            started = perf_counter()
+            await db.execute(sql, *args, **kwargs)
+            latencies.append(perf_counter() - started)
+
+    started = perf_counter()
+    await asyncio.gather(*(command(plan[i::options.concurrency]) for i in range(options.concurrency)))
+    elapsed = perf_counter() - started
+
+    await db.close()
+    latencies.sort()
+
+    return elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    options = parser.parse_args()
+
+    print(f"{options.statements} statements, {options.guilds * options.members} accounts")
+    print(f"{'profile':<14}{'total s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+
+    for profile in DataBase.sqlite_profiles:
+        with tempfile.TemporaryDirectory() as directory:
+            random.seed(0)
+            elapsed, p50, p99 = asyncio.run(replay(
+                os.path.join(directory, "bench.db"), profile, options))
+
+        print(f"{profile:<14}{elapsed:>10.2f}{p50 * 1000:>10.3f}{p99 * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,18 @@ logging.basicConfig(
     level=logging.ERROR,
     format=f"%(asctime)s - %(levelname)s: %(message)s")
 
+slow_query_handler = logging.FileHandler("slow_queries.log")
+slow_query_handler.setFormatter(logging.Formatter("%(asctime)s: %(message)s"))
+
+slow_query_log = logging.getLogger("warden.slow_queries")
+slow_query_log.setLevel(logging.WARNING)
+slow_query_log.propagate = False
+slow_query_log.addHandler(slow_query_handler)
+
+# warm up timings and totals drift reach warden.log although the root logger is at ERROR
+logging.getLogger("warden.warm_up").setLevel(logging.INFO)
+logging.getLogger("warden.economy_totals").setLevel(logging.WARNING)
+
 config = Config()
 
 bot = Warden(command_prefix=config.prefixes, config=config)
@@ -1,4 +1,7 @@
 from cogs.utils.db import DataBase
+from cogs.utils.migrations import MIGRATIONS
+from cogs.utils.guild_settings import GuildSettingsCache
+from cogs.utils.cooldown import CooldownConfig
 from cogs.utils.strings import multi_replace
 from cogs.utils.plugin_loader import PluginLoader
 
@@ -6,14 +9,19 @@ from discord.ext.commands import AutoShardedBot
 from pathlib import Path
 from aiohttp import ClientSession
 from datetime import datetime
+from time import perf_counter
 from json import load as json_load
 from context import WardenContext
 
 import logging
 import discord
 import random
+import asyncio
 
 
+# per-table timings, __main__ sets its level
+warm_up_log = logging.getLogger("warden.warm_up")
+
 # TODO: import bot config from bot class not in init args
 
 class Warden(AutoShardedBot):
@@ -26,9 +34,15 @@ class Warden(AutoShardedBot):
         self.assets_path = self.path.parent / "assets"
         self.session = ClientSession(loop=self.loop)
         self.db = DataBase(self.config.db_type, **self.config.database_settings)
+        self.guild_settings = GuildSettingsCache(self.db)
+        self.cooldown_config = CooldownConfig(self.config.default_cooldown)
 
         self.uptime = None
         self.langs = None
+        # commands wait for the caches to be filled at the first on_ready
+        self.warmed_up = asyncio.Event()
+        # cog name -> task with the last writes of an unloaded cog
+        self.unloading = {}
 
         if self.config.use_csharp_plugins:
             self.plugin_loader = PluginLoader(self)
@@ -89,19 +103,53 @@ class Warden(AutoShardedBot):
         return user.id in self.config.owners and not self.config.debug_mode
 
     def run(self):
+        self.loop.run_until_complete(self.db.migrate(MIGRATIONS))
         super().run(self.config.bot_token, reconnect=True)
 
     async def close(self):
         await self.session.close()
         await super().close()
 
+        for cog in tuple(self.cogs.values()):
+            if hasattr(cog, "flush"):
+                await cog.flush()
+
+        await self.wait_unloaded()
+        await self.db.flush()
+        await self.db.close()
+
+    async def wait_unloaded(self):
+        pending = [task for task in self.unloading.values() if not task.done()]
+
+        if pending:
+            await asyncio.wait(pending)
+
+    async def warm_up(self):
+        started = perf_counter()
+
+        try:
+            timings = await self.guild_settings.preload(
+                [guild.id for guild in self.guilds])
+            timings.update(await self.cooldown_config.load(self.db))
+
+            for cog in tuple(self.cogs.values()):
+                if not hasattr(cog, "warm_up"):
+                    continue
+
+                try:
+                    timings.update(await cog.warm_up())
+                except Exception as e:
+                    logging.error(f"Failed to warm up {cog.qualified_name}:\n{str(e)}")
+
+            for table, elapsed in timings.items():
+                warm_up_log.info(f"Warmed up {table} in {elapsed * 1000:.1f}ms")
+        finally:
+            self.warmed_up.set()
+
+        warm_up_log.info(f"Warm up finished in {perf_counter() - started:.2f}s")
+
     async def get_color(self, guild):
-        # if guild is not None:
-        color = await self.db.execute(
-            "SELECT `color` FROM `colors` WHERE `colors`.`server` = ?",
-            guild.id)
-        # else:
-        #     color = "rnd"
+        color = (await self.guild_settings.get(guild)).color
 
         if color is None:
             color = guild.me.color
@@ -113,9 +161,7 @@ class Warden(AutoShardedBot):
         return color
 
     async def get_lang(self, guild):
-        lang = await self.db.execute(
-            "SELECT `lang` FROM `langs` WHERE `langs`.`server` = ?",
-            guild.id)
+        lang = (await self.guild_settings.get(guild)).lang
         return self.langs[lang or self.config.default_lang]
 
     async def process_commands(self, message):
@@ -127,6 +173,8 @@ class Warden(AutoShardedBot):
         if ctx.command is None:
             return
 
+        await self.warmed_up.wait()
+
         ctx.lang = await self.get_lang(message.guild)
         ctx.color = await self.get_color(message.guild)
 
@@ -141,6 +189,7 @@ class Warden(AutoShardedBot):
 
         if self.uptime is None:
             self.uptime = datetime.now()
+            await self.warm_up()
 
         await self.change_presence(activity=discord.Activity(
             type=discord.ActivityType.watching,
@@ -16,6 +16,8 @@ class Administration(commands.Cog):
         check = await self.bot.db.execute(f"DELETE FROM `{table}` WHERE `{table}`.`server` = ?",
             ctx.guild.id, with_commit=True)
 
+        self.bot.guild_settings.invalidate(ctx.guild)
+
         if check:
             await ctx.answer(ctx.lang["admin"][deleted])
         else:
@@ -27,17 +29,16 @@ class Administration(commands.Cog):
         if content is not None:
             content = content[:EmbedConstants.DESC_MAX_LEN]
 
-            check = await self.bot.db.execute("UPDATE `welcome` SET `content` = ? WHERE `welcome`.`server` = ?",
-                content, ctx.guild.id, with_commit=True)
+            await self.bot.db.upsert("welcome", ("server", ), {
+                "server": ctx.guild.id,
+                "content": content
+            })
 
-            if not check:
-                await self.bot.db.execute("INSERT INTO `welcome` VALUES (?, ?)",
-                    ctx.guild.id, content, with_commit=True)
+            self.bot.guild_settings.invalidate(ctx.guild)
 
             return await ctx.answer(ctx.lang["admin"]["welcome_changed"])
 
-        check = await self.bot.db.execute("SELECT `content` FROM `welcome` WHERE `welcome`.`server` = ?",
-            ctx.guild.id)
+        check = (await self.bot.guild_settings.get(ctx.guild)).welcome
 
         if check is not None:
             await ctx.answer(check)
@@ -57,18 +58,17 @@ class Administration(commands.Cog):
             if role.id == ctx.guild.id:
                 raise commands.BadArgument(ctx.lang["errors"]["no_roles"])
 
-            check = await self.bot.db.execute("UPDATE `autorole` SET `role` = ? WHERE `autorole`.`server` = ?",
-                role.id, ctx.guild.id, with_commit=True)
-            
-            if not check:
-                await self.bot.db.execute("INSERT INTO `autorole` VALUES (?, ?)",
-                    ctx.guild.id, role.id, with_commit=True)
+            await self.bot.db.upsert("autorole", ("server", ), {
+                "server": ctx.guild.id,
+                "role": role.id
+            })
+
+            self.bot.guild_settings.invalidate(ctx.guild)
 
             return await ctx.answer(
                 ctx.lang["admin"]["now_autorole"].format(role.mention))
 
-        check = await self.bot.db.execute("SELECT `role` FROM `autorole` WHERE `autorole`.`server` = ?",
-            ctx.guild.id)
+        check = (await self.bot.guild_settings.get(ctx.guild)).autorole
 
         role = ctx.guild.get_role(check)
 
@@ -85,9 +85,7 @@ class Administration(commands.Cog):
             "autorole_deleted", "no_autorole")
 
     async def send_welcome(self, member):
-        welcome_content = await self.bot.db.execute(
-            "SELECT `content` FROM `welcome` WHERE `welcome`.`server` = ?",
-            member.guild.id)
+        welcome_content = (await self.bot.guild_settings.get(member.guild)).welcome
 
         if not welcome_content:
             return
@@ -115,9 +113,7 @@ class Administration(commands.Cog):
         if not member.guild.me.guild_permissions.manage_roles:
             return
 
-        autorole_id = await self.bot.db.execute(
-            "SELECT `role` FROM `autorole` WHERE `autorole`.`server` = ?",
-            member.guild.id)
+        autorole_id = (await self.bot.guild_settings.get(member.guild)).autorole
 
         if not autorole_id:
             return 
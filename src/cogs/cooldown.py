@@ -1,10 +1,10 @@
 import discord
 
-from discord.ext import commands
+from discord.ext import commands, tasks
 from typing import Union, Optional
 
 from .utils.converters import HumanTime, uint, CommandConverter
-from .utils.cooldown import CooldownCommand
+from .utils.cooldown import CooldownCommand, collect_cooldowns, save_cooldowns
 from .utils.checks import is_commander
 
 
@@ -12,42 +12,44 @@ class Cooldown(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.snapshot_cooldowns.start()
+
+    def cog_unload(self):
+        self.snapshot_cooldowns.stop()
+        # rows are collected now, the commands may be gone when the write runs
+        self.bot.unloading[self.qualified_name] = self.bot.loop.create_task(save_cooldowns(
+            self.bot, collect_cooldowns(self.bot.walk_commands())))
+
+    async def flush(self):
+        await save_cooldowns(self.bot, collect_cooldowns(self.bot.walk_commands()))
+
+    @tasks.loop(minutes=1, count=None)
+    async def snapshot_cooldowns(self):
+        await self.bot.wait_until_ready()
+        await self.flush()
 
     @commands.group(invoke_without_command=True)
     @is_commander()
     async def cooldown(self, ctx, command: CommandConverter(CooldownCommand), max_uses: uint, interval: HumanTime):
-        sql = """
-        UPDATE `cooldown`
-        SET `max_uses` = ?, `reset_seconds` = ?
-        WHERE `cooldown`.`server` = ? AND `cooldown`.`command` = ?
-        """
-        
-        check = await self.bot.db.execute(sql,
-            max_uses, interval, 
-            ctx.guild.id, command.qualified_name,
-            with_commit=True)
+        await self.bot.db.upsert("cooldown", ("server", "command"), {
+            "server": ctx.guild.id,
+            "command": command.qualified_name,
+            "max_uses": max_uses,
+            "reset_seconds": interval
+        })
 
-        if not check:
-            await self.bot.db.execute("INSERT INTO `cooldown` VALUES (?, ?, ?, ?)",
-                ctx.guild.id, command.qualified_name, max_uses, interval, with_commit=True)
+        self.bot.cooldown_config.set(ctx.guild.id, command.qualified_name, max_uses, interval)
 
         await ctx.answer(ctx.lang["economy"]["cooldown_updated"].format(
             command.qualified_name))
 
-        for bucket in command.custom_cooldown_buckets:
-            if bucket.guild == ctx.guild:
-                bucket.update(new_reset_seconds=interval, new_max_uses=max_uses)
+        for bucket in command.custom_cooldown_buckets.for_guild(ctx.guild.id):
+            bucket.update(new_reset_seconds=interval, new_max_uses=max_uses)
+            command.custom_cooldown_buckets.touch(bucket)
 
     @cooldown.command(name="for", aliases=["check"])
     async def cooldown_for(self, ctx, *, command: CommandConverter(CooldownCommand)):
-        sql = """
-        SELECT `max_uses`, `reset_seconds`
-        FROM `cooldown`
-        WHERE `cooldown`.`server` = ? AND `cooldown`.`command` = ?
-        """
-
-        cooldown_info = await self.bot.db.execute(sql,
-            ctx.guild.id, command.qualified_name) or self.bot.config.default_cooldown
+        cooldown_info = self.bot.cooldown_config.get(ctx.guild.id, command.qualified_name)
 
         em = discord.Embed(
             title=ctx.lang["economy"]["cooldown_for"].format(command.qualified_name),
@@ -70,18 +72,35 @@ class Cooldown(commands.Cog):
     @cooldown.command(name="reset")
     @is_commander()
     async def cooldown_reset(self, ctx, command: CommandConverter(CooldownCommand), *, role_or_member: Optional[Union[discord.Role, discord.Member]]):
-        buckets = filter(
-            lambda b: b.guild == ctx.guild, 
-            command.custom_cooldown_buckets)
+        buckets = command.custom_cooldown_buckets
+        delete_sql = """
+        DELETE FROM `cooldown_state`
+        WHERE `cooldown_state`.`server` = ? AND `cooldown_state`.`command` = ?
+        """
+
+        if role_or_member is None:
+            to_reset = buckets.for_guild(ctx.guild.id)
 
-        if role_or_member is not None:
+            buckets.restore(ctx.guild.id, ())
+            await self.bot.db.execute(delete_sql, 
+                ctx.guild.id, command.qualified_name, with_commit=True)
+        else:
             if isinstance(role_or_member, discord.Role):
-                buckets = filter(lambda b: role_or_member in b.user.roles, buckets)
+                members = role_or_member.members
             else:
-                buckets = filter(lambda b: b.user == role_or_member, buckets)
+                members = (role_or_member, )
+
+            to_reset = filter(None, (buckets.get(ctx.guild.id, m.id) for m in members))
+
+            for member in members:
+                buckets.pop_restored(ctx.guild.id, member.id)
+
+            await self.bot.db.executemany(f"{delete_sql} AND `cooldown_state`.`member` = ?",
+                [(ctx.guild.id, command.qualified_name, m.id) for m in members], with_commit=True)
 
-        for bucket in buckets:
+        for bucket in to_reset:
             bucket.update()
+            buckets.touch(bucket)
 
         await ctx.answer(ctx.lang["economy"]["cooldown_reset"].format(
             command.qualified_name, 
@@ -96,6 +115,7 @@ class Cooldown(commands.Cog):
         
         if current_bucket is not None:
             current_bucket.remaining_uses += 1
+            ctx.command.custom_cooldown_buckets.touch(current_bucket)
 
 
 def setup(bot):
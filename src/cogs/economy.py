@@ -1,71 +1,163 @@
 import discord
 import logging
 import random
+import asyncio
 import datetime as dt
 
-from discord.ext import commands
+from discord.ext import commands, tasks
 from enum import Enum
 from typing import Optional, Union
 from math import ceil
 from asyncio import TimeoutError
-from collections import namedtuple
+from collections import namedtuple, OrderedDict, Counter
+from weakref import WeakValueDictionary
+from time import perf_counter
 
-from .utils.cooldown import CooldownCommand, custom_cooldown
+from .utils.cooldown import CooldownCommand, custom_cooldown, collect_cooldowns, save_cooldowns
 from .utils.constants import EconomyConstants, StringConstants, EmbedConstants
 from .utils.converters import (NotAuthor, uint, IndexConverter, 
     Index, HumanTime, CommandConverter, EnumConverter, without_whitespace, EqualRole)
 from .utils.checks import is_commander, has_permissions
 from .utils.strings import markdown, human_choice
-from .utils.models import PseudoMember, ContextFormatter
-from .utils.db import DbType
+from .utils.models import ContextFormatter, PseudoMember
+from .utils.db import int_timestamp, DbType
+from .utils.leaderboard import Leaderboard
+from .utils.economy_totals import EconomyTotals
+from .utils.sampler import RandomSampler
+from .utils.economy_config import EconomyConfigCache
+from .utils.loading import SharedLoads
 
 # TODO: fill MORE stories lists in langs
 
 class Account:
 
-    def __init__(self, bot, member, cash=None, bank=None, saved=False):
-        self.bot = bot
+    def __init__(self, eco, member, cash=None, bank=None, saved=False):
+        self.eco = eco
+        self.bot = eco.bot
         self.member = member
         self.cash = cash
         self.bank = bank
         self.saved = saved
+        # values in the money table and values counted in the economy totals
+        self.stored = (cash, bank) if saved else None
+        self.counted = self.stored
 
     @property
     def sum(self):
         return self.bank + self.cash
 
-    async def save(self):
-        update_sql = """
-        UPDATE `money` 
-        SET `cash` = ?, `bank` = ? 
-        WHERE `money`.`server` = ? AND `money`.`member` = ?
-        """
-
-        check = await self.bot.db.execute(
-            update_sql, self.cash, 
-            self.bank, self.member.guild.id, 
-            self.member.id, with_commit=True)
+    @property
+    def key(self):
+        return (self.member.guild.id, self.member.id)
 
-        if not check:
-            await self.bot.db.execute(
-                "INSERT INTO `money` VALUES (?, ?, ?, ?)",
-                self.member.guild.id, self.member.id, 
-                self.cash, self.bank, with_commit=True)
+    async def save(self):
+        # written to the db by the account store's next flush
+        self.eco.accounts.mark_dirty(self)
+        self.publish()
 
+    def publish(self):
         self.saved = True
+        self.eco.totals.update(self.member.guild.id, self.counted, (self.cash, self.bank))
+        self.counted = (self.cash, self.bank)
+        self.eco.leaderboard.update(self.member.guild.id, self.member.id, self.sum)
 
     async def delete(self):
-        await self.bot.db.execute(
-            "DELETE FROM `money` WHERE `money`.`server` = ? AND `money`.`member` = ?",
-            self.member.guild.id, self.member.id, with_commit=True)
+        await self.eco.accounts.delete(self.member.guild.id, self.member.id)
 
+        self.eco.totals.update(self.member.guild.id, self.counted, None)
+        self.counted = self.stored = None
+        self.eco.leaderboard.remove(self.member.guild.id, self.member.id)
 
-class _Economy:
 
-    def __init__(self, bot):
-        self.bot = bot
+class AccountStore:
 
-    async def get_money(self, member):
+    def __init__(self, eco, *, capacity=50000, chunk_size=500):
+        self.eco = eco
+        self.bot = eco.bot
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        # (guild id, member id) -> Account, least recently used first
+        self._accounts = OrderedDict()
+        # accounts pushed out of the lru that a running command still holds,
+        # they come back on the next lookup instead of being read twice
+        self._evicted = WeakValueDictionary()
+        self._loading = SharedLoads()
+        self._dirty = set()
+        self.write_lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._accounts)
+
+    async def get(self, member) -> Account:
+        key = (member.guild.id, member.id)
+        account = self._accounts.get(key) or self._evicted.pop(key, None)
+
+        if account is not None:
+            # bulk loaded accounts only know the member id
+            account.member = member
+            self._insert(key, account)
+            return account
+
+        account = await self._loading.run(key, self._load, member)
+        account.member = member
+
+        return account
+
+    async def get_many(self, guild, member_ids) -> list:
+        accounts = {}
+        loading = []
+        missing = []
+
+        for member_id in member_ids:
+            key = (guild.id, member_id)
+            account = self._accounts.get(key) or self._evicted.pop(key, None)
+
+            if account is not None:
+                self._insert(key, account)
+                accounts[member_id] = account
+            elif key in self._loading:
+                loading.append(self._loading.get(key))
+            else:
+                missing.append(member_id)
+
+        if missing:
+            select_money_sql = """
+            SELECT `member`, `cash`, `bank`
+            FROM `money`
+            WHERE `money`.`server` = ? AND `money`.`member` IN ({})
+            """
+
+            rows = {}
+
+            for i in range(0, len(missing), self.chunk_size):
+                chunk = missing[i:i + self.chunk_size]
+                sql = select_money_sql.format(', '.join('?' for _ in chunk))
+
+                for member_id, cash, bank in await self.bot.db.execute(
+                        sql, guild.id, *chunk, fetch_all=True) or ():
+                    rows[member_id] = (cash, bank)
+
+            start = await self.eco.configs.start_money(guild)
+
+            for member_id in missing:
+                key = (guild.id, member_id)
+                # a single get may have read the account while the chunks ran
+                account = self._accounts.get(key) or self._evicted.pop(key, None)
+
+                if account is None:
+                    cash, bank = rows.get(member_id) or start or (0, 0)
+                    member = guild.get_member(member_id) or PseudoMember(member_id, guild)
+                    account = Account(self.eco, member, cash, bank, member_id in rows)
+
+                self._insert(key, account)
+                accounts[member_id] = account
+
+        for account in await asyncio.gather(*(asyncio.shield(f) for f in loading)):
+            accounts[account.member.id] = account
+
+        return list(accounts.values())
+
+    async def _load(self, member) -> Account:
         select_money_sql = """
         SELECT `cash`, `bank` 
         FROM `money` 
@@ -78,21 +170,286 @@ class _Economy:
             member.id)
 
         if money is None:
-            select_start_sql = """
-            SELECT `cash`, `bank` 
-            FROM `start_money` 
-            WHERE `start_money`.`server` = ?
-            """
+            cash, bank = await self.eco.configs.start_money(member.guild) or (0, 0)
+        else:
+            cash, bank = money
+
+        account = Account(self.eco, member, cash, bank, money is not None)
+        self._insert(account.key, account)
+
+        return account
+
+    def _insert(self, key, account):
+        self._accounts[key] = account
+        self._accounts.move_to_end(key)
 
-            start = await self.bot.db.execute(
-                select_start_sql,  
-                member.guild.id)
+        excess = len(self._accounts) - self.capacity
 
-            cash, bank = start or (0, 0)
+        if excess <= 0:
+            return
+
+        # dirty accounts stay until they are flushed
+        victims = []
+
+        for victim in self._accounts:
+            if len(victims) >= excess:
+                break
+
+            if victim not in self._dirty:
+                victims.append(victim)
+
+        for victim in victims:
+            self._evicted[victim] = self._accounts.pop(victim)
+
+    def mark_dirty(self, account):
+        key = account.key
+
+        if self._accounts.get(key) is not account:
+            self._insert(key, account)
+
+        self._dirty.add(key)
+
+    def is_clean(self, account):
+        return account.key not in self._dirty and account.stored == (account.cash, account.bank)
+
+    def settle(self, account, stored):
+        # the caller has just written these values to the money row itself
+        account.stored = stored
+
+        if (account.cash, account.bank) == stored:
+            self._dirty.discard(account.key)
         else:
-            cash, bank = money
+            self.mark_dirty(account)
+
+    def dirty_sums(self, guild_id):
+        for key in self._dirty:
+            if key[0] == guild_id:
+                yield key[1], self._accounts[key].sum
+
+    def dirty_deltas(self, guild_id):
+        for key in self._dirty:
+            if key[0] == guild_id:
+                account = self._accounts[key]
+                stored_cash, stored_bank = account.stored or (0, 0)
+
+                yield (account.counted[0] - stored_cash, account.counted[1] - stored_bank,
+                    int(account.stored is None))
+
+    def cached(self, guild_id):
+        for key, account in (*self._accounts.items(), *self._evicted.items()):
+            if key[0] == guild_id:
+                yield account
+
+    async def flush(self) -> int:
+        async with self.write_lock:
+            return await self.flush_locked()
+
+    async def flush_locked(self) -> int:
+        # the caller holds write_lock, values are taken right away and
+        # later changes mark the account again
+        keys, self._dirty = self._dirty, set()
+        # the accounts themselves are kept, a command may push them out of
+        # the lru while the chunks are written
+        accounts = [self._accounts[key] for key in keys]
+        rows = [(account, *account.key, account.cash, account.bank) for account in accounts]
+
+        sql = self.bot.db.upsert_query("money", ("server", "member"),
+            ("server", "member", "cash", "bank"), ("cash", "bank"))
+
+        for i in range(0, len(rows), self.chunk_size):
+            chunk = rows[i:i + self.chunk_size]
+
+            if await self.bot.db.executemany(sql, [row[1:] for row in chunk], with_commit=True) is None:
+                for account, *_ in chunk:
+                    self.mark_dirty(account)
+            else:
+                for account, _, _, cash, bank in chunk:
+                    account.stored = (cash, bank)
+
+        return len(rows)
+
+    async def delete(self, guild_id, member_id):
+        key = (guild_id, member_id)
+
+        async with self.write_lock:
+            self._dirty.discard(key)
+            self._accounts.pop(key, None)
+            self._evicted.pop(key, None)
+
+            await self.bot.db.execute(
+                "DELETE FROM `money` WHERE `money`.`server` = ? AND `money`.`member` = ?",
+                guild_id, member_id, with_commit=True)
+
+    async def delete_guild(self, guild_id):
+        async with self.write_lock:
+            for key in [key for key in self._accounts if key[0] == guild_id]:
+                self._dirty.discard(key)
+                del self._accounts[key]
+
+            for key in [key for key in self._evicted.keys() if key[0] == guild_id]:
+                self._evicted.pop(key, None)
+
+            await self.bot.db.execute(
+                "DELETE FROM `money` WHERE `money`.`server` = ?",
+                guild_id, with_commit=True)
+
+
+class IncomeRule:
+
+    __slots__ = ("amount", "is_percentage", "interval", "seen")
+
+    def __init__(self, amount, is_percentage, interval, seen):
+        self.amount = amount
+        self.is_percentage = is_percentage
+        self.interval = interval
+        self.seen = seen
+
+    def ticks(self, now):
+        if self.interval <= 0:
+            return 0
+
+        return max(now - self.seen, 0) // self.interval
+
+
+class IncomeBook:
+
+    def __init__(self, eco, *, chunk_size=500):
+        self.eco = eco
+        self.bot = eco.bot
+        self.chunk_size = chunk_size
+        # guild id -> {member id: IncomeRule}
+        self._guilds = {}
+        self._loading = SharedLoads()
+        # (guild id, member id) of rules whose seen is newer than the income table
+        self._dirty = set()
+        self._lock = asyncio.Lock()
+
+    async def get(self, guild_id) -> dict:
+        rules = self._guilds.get(guild_id)
+
+        if rules is not None:
+            return rules
+
+        return await self._loading.run(guild_id, self._load, guild_id)
+
+    async def _load(self, guild_id) -> dict:
+        select_sql = """
+        SELECT `member`, `amount`, `is_percentage`, `interval`, `seen`
+        FROM `income`
+        WHERE `income`.`server` = ?
+        """
+
+        rows = await self.bot.db.execute(select_sql, guild_id, fetch_all=True)
+        rules = self._guilds[guild_id] = {
+            member_id: IncomeRule(*values) for member_id, *values in rows or ()}
+
+        return rules
+
+    async def load_all(self) -> dict:
+        started = perf_counter()
+        rows = await self.bot.db.execute(
+            "SELECT `server`, `member`, `amount`, `is_percentage`, `interval`, `seen` FROM `income`",
+            fetch_all=True)
 
-        account = Account(self.bot, member, cash, bank, money is not None)
+        guilds = {}
+
+        for guild_id, member_id, *values in rows or ():
+            guilds.setdefault(guild_id, {})[member_id] = IncomeRule(*values)
+
+        for guild in self.bot.guilds:
+            guilds.setdefault(guild.id, {})
+
+        # guilds read by a command in the meantime keep their newer rules
+        for guild_id, rules in guilds.items():
+            self._guilds.setdefault(guild_id, rules)
+
+        return {"income": perf_counter() - started}
+
+    def accrue(self, account, rule, now) -> bool:
+        ticks = rule.ticks(now)
+
+        if ticks == 0:
+            return False
+
+        if rule.is_percentage:
+            account.bank += ceil(account.bank * (rule.amount / 100)) * ticks
+        else:
+            account.bank += rule.amount * ticks
+
+        # the unfinished interval is kept for the next accrual
+        rule.seen += ticks * rule.interval
+        self._dirty.add(account.key)
+
+        return True
+
+    async def set(self, guild_id, member_id, amount, is_percentage, interval):
+        rules = await self.get(guild_id)
+
+        async with self._lock:
+            rule = IncomeRule(amount, is_percentage, interval, int_timestamp())
+
+            await self.bot.db.upsert("income", ("server", "member"), {
+                "server": guild_id,
+                "member": member_id,
+                "amount": rule.amount,
+                "is_percentage": rule.is_percentage,
+                "interval": rule.interval,
+                "seen": rule.seen
+            })
+
+            rules[member_id] = rule
+            self._dirty.discard((guild_id, member_id))
+
+    async def remove(self, guild_id, member_id) -> bool:
+        rules = await self.get(guild_id)
+
+        async with self._lock:
+            rules.pop(member_id, None)
+            self._dirty.discard((guild_id, member_id))
+
+            return bool(await self.bot.db.execute(
+                "DELETE FROM `income` WHERE `income`.`server` = ? AND `income`.`member` = ?",
+                guild_id, member_id, with_commit=True))
+
+    async def flush(self) -> int:
+        async with self._lock:
+            keys, self._dirty = self._dirty, set()
+            rows = [(self._guilds[guild_id][member_id].seen, guild_id, member_id)
+                for guild_id, member_id in keys]
+
+            update_sql = """
+            UPDATE `income`
+            SET `seen` = ?
+            WHERE `income`.`server` = ? AND `income`.`member` = ?
+            """
+
+            for i in range(0, len(rows), self.chunk_size):
+                chunk = rows[i:i + self.chunk_size]
+
+                if await self.bot.db.executemany(update_sql, chunk, with_commit=True) is None:
+                    self._dirty.update((guild_id, member_id) for _, guild_id, member_id in chunk
+                        if member_id in self._guilds.get(guild_id, ()))
+
+            return len(rows)
+
+
+class _Economy:
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.configs = EconomyConfigCache(bot.db, bot.config.default_game_config)
+        self.accounts = AccountStore(self)
+        self.incomes = IncomeBook(self)
+        self.leaderboard = Leaderboard(bot.db, 
+            overlay=self.accounts.dirty_sums, lock=self.accounts.write_lock)
+        self.totals = EconomyTotals(bot.db, 
+            overlay=self.accounts.dirty_deltas, lock=self.accounts.write_lock)
+        # (guild id, lang, command, result type) -> (id, text) of the stories
+        self.stories = RandomSampler(self._load_stories)
+        self.shop = ShopCatalog(self)
+
+    async def get_money(self, member):
+        account = await self.accounts.get(member)
         
         await self.get_income(account)
         
@@ -100,68 +457,196 @@ class _Economy:
 
     async def get_income(self, account):
         if account.bank >= self.bot.db.int_max_bound:
-            return 
-        
-        select_sql = """
-        SELECT `income`.`amount`, `is_percentage`,
-            (UNIX_TIMESTAMP() - `income`.`seen`) / `income`.`interval`
-        FROM `income`
-        WHERE `income`.`server` = ? AND `income`.`member` = ?
-            AND `income`.`seen` + `income`.`interval` <= UNIX_TIMESTAMP()
-        """
+            return
 
-        income = await self.bot.db.execute(
-            select_sql, 
-            account.member.guild.id, 
-            account.member.id)
+        rules = await self.incomes.get(account.member.guild.id)
+        rule = rules.get(account.member.id)
 
-        if income is None:
-            return
+        if rule is not None and self.incomes.accrue(account, rule, int_timestamp()):
+            await account.save()
 
-        update_sql = """
-        UPDATE `income`
-        SET `seen` = UNIX_TIMESTAMP()
-        WHERE `income`.`server` = ? AND `income`.`member` = ?
-        """
+    async def settle_income(self, guild) -> int:
+        rules = await self.incomes.get(guild.id)
+        now = int_timestamp()
+        due = [member_id for member_id, rule in rules.items() if rule.ticks(now) > 0]
 
-        await self.bot.db.execute(
-            update_sql,
-            account.member.guild.id,
-            account.member.id,
-            with_commit=True)
+        if not due:
+            return 0
 
-        amount, is_percentage, ticks = income
+        settled = 0
 
-        if is_percentage:
-            account.bank += ceil(account.bank * (amount / 100)) * ticks
-        else:
-            account.bank += amount * ticks
+        # one read for every due account, the writes go out with the next flush
+        for account in await self.accounts.get_many(guild, due):
+            rule = rules.get(account.member.id)
 
-        await account.save()
+            if (rule is None or account.bank >= self.bot.db.int_max_bound 
+                    or not self.incomes.accrue(account, rule, now)):
+                continue
 
-    async def get_place(self, member):
-        select_place_sql = """
-        SELECT `member` 
-        FROM `money` 
-        WHERE `money`.`server` = ? AND `money`.`cash` + `money`.`bank` > 0 
-        ORDER BY `money`.`cash` + `money`.`bank` DESC
+            await account.save()
+            settled += 1
+
+        return settled
+
+    async def transfer(self, guild, from_member, to_member, amount, field="cash", *, overdraw=False) -> bool:
+        if field not in ("cash", "bank"):
+            raise ValueError(f"Unknown money field {field}")
+
+        index = ("cash", "bank").index(field)
+        from_account = from_member and await self.get_money(from_member)
+        to_account = to_member and await self.get_money(to_member)
+
+        upsert_sql = self.bot.db.upsert_query("money", ("server", "member"),
+            ("server", "member", "cash", "bank"), ("cash", "bank"))
+
+        debit_sql = f"""
+        UPDATE `money`
+        SET `{field}` = `{field}` - ?
+        WHERE `money`.`server` = ? AND `money`.`member` = ?
         """
 
-        all_accounts = await self.bot.db.execute(
-            select_place_sql, member.guild.id, 
-            fetch_all=True)
+        if not overdraw:
+            debit_sql += f" AND `money`.`{field}` >= ?"
+
+        written = []
+        moved = True
+
+        # no flush may write these rows between the check and the credit
+        async with self.accounts.write_lock:
+            async with self.bot.db.transaction():
+                if from_account:
+                    values = [from_account.cash, from_account.bank]
+
+                    # the debit has to be checked against what the account holds now
+                    if not self.accounts.is_clean(from_account):
+                        await self.bot.db.execute(
+                            upsert_sql, guild.id, from_member.id, *values, with_commit=True)
+                        written.append((from_account, tuple(values)))
+
+                    moved = bool(await self.bot.db.execute(
+                        debit_sql, amount, guild.id, from_member.id, 
+                        *(() if overdraw else (amount, )), with_commit=True))
+
+                    if moved:
+                        values[index] -= amount
+                        written.append((from_account, tuple(values)))
+
+                if moved and to_account:
+                    values = [to_account.cash, to_account.bank]
+                    values[index] += amount
+
+                    await self.bot.db.execute(
+                        upsert_sql, guild.id, to_member.id, *values, with_commit=True)
+                    written.append((to_account, tuple(values)))
+
+            if moved:
+                if from_account:
+                    setattr(from_account, field, getattr(from_account, field) - amount)
+
+                if to_account:
+                    setattr(to_account, field, getattr(to_account, field) + amount)
+
+            for account, values in written:
+                self.accounts.settle(account, values)
+
+            if moved:
+                for account in filter(None, (from_account, to_account)):
+                    account.publish()
+
+        return moved
+
+    async def bulk_add(self, guild, members, field, amount) -> int:
+        return await self._bulk_update(guild, members, field, 
+            f"`{field}` + ?", (amount, ), "", (), lambda value: value + amount)
+
+    async def bulk_reset(self, guild, members, field, below=None) -> int:
+        # a reset only clears accounts that exist
+        if below is None:
+            return await self._bulk_update(guild, members, field, 
+                "0", (), "", (), lambda value: 0, insert_missing=False)
+
+        return await self._bulk_update(guild, members, field, 
+            "0", (), f" AND `money`.`{field}` < ?", (below, ), 
+            lambda value: 0 if value < below else value, insert_missing=False)
+
+    async def _bulk_update(self, guild, members, field, assignment, args, 
+                           condition, condition_args, apply, *, insert_missing=True) -> int:
+        if field not in ("cash", "bank"):
+            raise ValueError(f"Unknown money field {field}")
+
+        index = ("cash", "bank").index(field)
+        start = await self.configs.start_money(guild) or (0, 0)
+        member_ids = [member.id for member in (guild.members if members is None else members)
+            if not member.bot]
+        chunk_size = self.accounts.chunk_size
+
+        # members without a row get the start money first, as a single add-money would do
+        insert_sql = self.bot.db.upsert_query("money", ("server", "member"),
+            ("server", "member", "cash", "bank"), ())
+
+        update_sql = f"""
+        UPDATE `money`
+        SET `{field}` = {assignment}
+        WHERE `money`.`server` = ?{condition}
+        """
+
+        affected = 0
 
-        member_case = (member.id, )
+        # cached accounts are written first and follow the update below,
+        # no flush may write their old values in between
+        async with self.accounts.write_lock:
+            await self.accounts.flush_locked()
 
-        if all_accounts is None or len(all_accounts) == 0 or member_case not in all_accounts:
-            return 1
+            async with self.bot.db.transaction():
+                for i in range(0, len(member_ids) if insert_missing else 0, chunk_size):
+                    await self.bot.db.executemany(insert_sql, 
+                        [(guild.id, member_id, *start) for member_id in member_ids[i:i + chunk_size]],
+                        with_commit=True)
 
-        return all_accounts.index(member_case) + 1
+                if members is None:
+                    affected = await self.bot.db.execute(
+                        update_sql, *args, guild.id, *condition_args, with_commit=True)
+                else:
+                    update_sql += " AND `money`.`member` = ?"
+
+                    for i in range(0, len(member_ids), chunk_size):
+                        affected += await self.bot.db.executemany(update_sql, 
+                            [(*args, guild.id, *condition_args, member_id) 
+                                for member_id in member_ids[i:i + chunk_size]],
+                            with_commit=True)
+
+            targets = set(member_ids)
+
+            for account in tuple(self.accounts.cached(guild.id)):
+                targeted = account.member.id in targets
+
+                if members is not None and not targeted:
+                    continue
+
+                # accounts without a row only follow when one was inserted
+                if account.stored is None and not (insert_missing and targeted):
+                    continue
+
+                stored = list(account.stored or start)
+                stored[index] = apply(stored[index])
+
+                setattr(account, field, apply(getattr(account, field)))
+                self.accounts.settle(account, tuple(stored))
+                account.publish()
+
+            # rows that are not cached changed as well
+            self.leaderboard.invalidate(guild.id)
+            self.totals.invalidate(guild.id)
+
+        return affected
+
+    async def get_place(self, member):
+        ranking = await self.leaderboard.get(member.guild.id)
+
+        return ranking.place(member.id) or 1
 
     async def get_currency(self, guild):
-        currency = await self.bot.db.execute(
-            "SELECT `symbol` FROM `currency` WHERE `currency`.`server` = ?",
-            guild.id)
+        currency = (await self.bot.guild_settings.get(guild)).currency
 
         emoji = self.bot.get_emoji(currency)
 
@@ -171,51 +656,32 @@ class _Economy:
         return str(emoji)
 
     async def get_chance(self, guild, command):
-        select_sql = """
-        SELECT `chance`
-        FROM `chances`
-        WHERE `chances`.`server` = ? AND `chances`.`command` = ?
-        """
+        chance, _ = await self.configs.game_config(guild, command.qualified_name)
 
-        current_chance = await self.bot.db.execute(
-            select_sql, guild.id, command.qualified_name)
+        return chance
 
-        if current_chance is None:
-            current_chance = self.bot.config.default_chances.get(
-                command.qualified_name, 50)
-
-        return current_chance
-
-    async def get_game_config(self, ctx, command=None):
-        config_select_sql = """
-        SELECT `chance`, `reward`
-        FROM `game_config`
-        WHERE `game_config`.`server` = ? AND `game_config`.`command` = ?
-        """
-
-        story_select_sql = """
+    async def _load_stories(self, key):
+        sql = """
         SELECT `id`, `text` FROM `story`
         WHERE `story`.`server` = ? AND `story`.`lang` = ? 
             AND `story`.`type` = ? AND `story`.`result_type` = ?
-        ORDER BY RAND() 
-        LIMIT 1
         """
 
+        return await self.bot.db.execute(sql, *key, fetch_all=True) or ()
+
+    async def get_game_config(self, ctx, command=None):
         if command is None:
             command = ctx.command
 
-        game_config = await self.bot.db.execute(
-            config_select_sql, ctx.guild.id, 
-            command.qualified_name)
-        
-        config = EconomyGameConfig(*(game_config or self.bot.config.default_game_config))
+        config = EconomyGameConfig(*await self.configs.game_config(
+            ctx.guild, command.qualified_name))
 
         if isinstance(command, StoryGame):
-            story = await self.bot.db.execute(
-                story_select_sql, ctx.guild.id, 
+            story = await self.stories.choice((
+                ctx.guild.id, 
                 ctx.lang["lang_code"], 
                 command.qualified_name,
-                config.game_result.value)
+                config.game_result.value))
 
             config.story = story or (None, random.choice(
                 ctx.lang["economy"]["stories"][command.qualified_name][config.game_result.name]))
@@ -228,54 +694,32 @@ class _Economy:
         if chance is None and reward is None:
             return
 
-        update_sql = """
-        UPDATE `game_config` 
-        {} 
-        WHERE `game_config`.`server` = ? AND `game_config`.`command` = ?
-        """
+        update_columns = []
 
-        if chance is not None and reward is not None:
-            check = await self.bot.db.execute(
-                update_sql.format("SET `reward` = ?, `chance` = ?"),
-                reward, chance, guild.id, command.qualified_name,
-                with_commit=True)
-        elif chance is not None:
-            check = await self.bot.db.execute(
-                update_sql.format("SET `chance` = ?"),
-                chance, guild.id, command.qualified_name,
-                with_commit=True)
-        elif reward is not None:
-            check = await self.bot.db.execute(
-                update_sql.format("SET `reward` = ?"),
-                reward, guild.id, command.qualified_name,
-                with_commit=True)
+        if chance is not None:
+            update_columns.append("chance")
 
-        if not check:
-            await self.bot.db.execute(
-                "INSERT INTO `game_config` VALUES (?, ?, ?, ?)",
-                guild.id, command.qualified_name,
-                chance or self.bot.config.default_game_config[0],
-                reward or self.bot.config.default_game_config[1])
+        if reward is not None:
+            update_columns.append("reward")
 
-    async def get_item(self, guild, name):
-        select_sql = """
-        SELECT `author`, `buy_count`, {}  
-        FROM `shop_items`
-        WHERE `shop_items`.`server` = ? AND `shop_items`.`name` = ?
-        """
-        
-        to_select = ', '.join(markdown(prop, '`') for prop in ShopItem.properties.keys())
-        check = await self.bot.db.execute(select_sql.format(to_select), guild.id, name)
+        await self.bot.db.upsert("game_config", ("server", "command"), {
+            "server": guild.id,
+            "command": command.qualified_name,
+            "chance": chance or self.bot.config.default_game_config[0],
+            "reward": reward or self.bot.config.default_game_config[1]
+        }, update_columns=update_columns)
 
-        if check is None:
-            return
+        self.configs.invalidate(guild)
 
-        check = list(check)
-        check[0] = guild.get_member(check[0])
-        check[5] = guild.get_role(check[5])
-        check[7] = EnumConverter.convert_value(MessageType, check[7])
+    async def get_item(self, guild, name):
+        return await self.shop.item(guild, name)
 
-        return ShopItem(guild, *check)
+    async def flush(self):
+        # seen goes out first, a crash in between drops the accrual with the
+        # other unflushed changes instead of paying it twice
+        await self.incomes.flush()
+        await self.accounts.flush()
+        await self.shop.flush()
 
 
 class MessageType(Enum):
@@ -306,6 +750,186 @@ class ShopItem:
             setattr(self, fields_names[i], arg)
 
 
+class GuildCatalog:
+
+    __slots__ = ("items", "_folded", "_by_price")
+
+    def __init__(self, rows=(), *, fold_case=False):
+        # item name -> row in the shop_items column order without the server
+        self.items = {row[2]: list(row) for row in rows}
+        # lowercase name -> name, only where the db matches names that way
+        # (the mysql collation ignores case, sqlite doesn't)
+        self._folded = {name.lower(): name for name in self.items} if fold_case else None
+        self._by_price = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, name):
+        row = self.items.get(name)
+
+        if row is None and self._folded is not None:
+            row = self.items.get(self._folded.get(name.lower()))
+
+        return row
+
+    def put(self, row):
+        self.items[row[2]] = row
+        self._by_price = None
+
+        if self._folded is not None:
+            self._folded[row[2].lower()] = row[2]
+
+    def pop(self, name):
+        row = self.items.pop(name, None)
+
+        if row is not None and self._folded is not None and self._folded.get(name.lower()) == name:
+            del self._folded[name.lower()]
+
+        self._by_price = None
+
+        return row
+
+    def page(self, index, per_page):
+        if self._by_price is None:
+            self._by_price = sorted(self.items.values(), key=lambda row: row[3], reverse=True)
+
+        return self._by_price[index * per_page:(index + 1) * per_page]
+
+
+class ShopCatalog:
+
+    columns = ("author", "buy_count", *ShopItem.properties.keys())
+
+    def __init__(self, eco):
+        self.eco = eco
+        self.bot = eco.bot
+        self._guilds = {}
+        self._loading = SharedLoads()
+        # (guild id, item name) -> purchases not added to buy_count yet
+        self._bought = Counter()
+
+    async def get(self, guild_id) -> GuildCatalog:
+        catalog = self._guilds.get(guild_id)
+
+        if catalog is not None:
+            return catalog
+
+        return await self._loading.run(guild_id, self._load, guild_id)
+
+    async def _load(self, guild_id) -> GuildCatalog:
+        select_sql = """
+        SELECT {}
+        FROM `shop_items`
+        WHERE `shop_items`.`server` = ?
+        """
+
+        rows = await self.bot.db.execute(
+            select_sql.format(', '.join(markdown(column, '`') for column in self.columns)),
+            guild_id, fetch_all=True)
+
+        catalog = self._guilds[guild_id] = GuildCatalog(rows or (), 
+            fold_case=self.bot.db.db_type is DbType.MySQL)
+
+        for (bought_guild_id, name), count in self._bought.items():
+            row = catalog.items.get(name) if bought_guild_id == guild_id else None
+
+            if row is not None:
+                row[1] += count
+
+        return catalog
+
+    def make_item(self, guild, row):
+        row = list(row)
+        row[0] = guild.get_member(row[0])
+        row[5] = guild.get_role(row[5])
+        row[7] = EnumConverter.convert_value(MessageType, row[7])
+
+        return ShopItem(guild, *row)
+
+    async def item(self, guild, name):
+        row = (await self.get(guild.id)).get(name)
+
+        if row is None:
+            return
+
+        return self.make_item(guild, row)
+
+    async def create(self, guild_id, author_id, values):
+        catalog = await self.get(guild_id)
+        row = [author_id, 0, *values]
+
+        check = await self.bot.db.execute(
+            "INSERT INTO `shop_items` VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            guild_id, *row, with_commit=True)
+
+        if check:
+            catalog.put(row)
+
+    async def edit(self, guild_id, name, prop, value):
+        catalog = await self.get(guild_id)
+
+        update_sql = """
+        UPDATE `shop_items` 
+        SET `{}` = ? 
+        WHERE `shop_items`.`server` = ? AND `shop_items`.`name` = ?
+        """
+
+        await self.bot.db.execute(update_sql.format(prop), 
+            value, guild_id, name, with_commit=True)
+
+        row = catalog.pop(name)
+
+        if row is not None:
+            row[self.columns.index(prop)] = value
+            catalog.put(row)
+
+        if prop == "name" and (guild_id, name) in self._bought:
+            self._bought[guild_id, value] += self._bought.pop((guild_id, name))
+
+    async def delete(self, guild_id, name):
+        catalog = await self.get(guild_id)
+
+        delete_sql = """
+        DELETE FROM `shop_items` 
+        WHERE `shop_items`.`server` = ? AND `shop_items`.`name` = ?
+        """
+
+        catalog.pop(name)
+        self._bought.pop((guild_id, name), None)
+
+        return await self.bot.db.execute(
+            delete_sql, guild_id, name, with_commit=True)
+
+    def bought(self, guild_id, name):
+        catalog = self._guilds.get(guild_id)
+        row = catalog and catalog.items.get(name)
+
+        if row is not None:
+            row[1] += 1
+
+        # written by the next flush
+        self._bought[guild_id, name] += 1
+
+    async def flush(self):
+        if not self._bought:
+            return
+
+        bought, self._bought = self._bought, Counter()
+
+        update_sql = """
+        UPDATE `shop_items`
+        SET `buy_count` = `buy_count` + ?
+        WHERE `shop_items`.`server` = ? AND `shop_items`.`name` = ?
+        """
+
+        if await self.bot.db.executemany(update_sql, 
+                [(count, guild_id, name) for (guild_id, name), count in bought.items()],
+                with_commit=True) is None:
+            # a failed write keeps the counts for the next flush
+            self._bought.update(bought)
+
+
 class EconomyGameConfig:
 
     def __init__(self, chance, reward):
@@ -323,8 +947,17 @@ class EconomyGameConfig:
 class EconomyCommand(commands.Command):
     
     async def invoke(self, ctx):
-        ctx.currency = await ctx.cog.eco.get_currency(ctx.guild)
-        await super().invoke(ctx)
+        # checks and converters read the economy as well
+        await self.cog.enter()
+
+        try:
+            await self.prepare_context(ctx)
+            await super().invoke(ctx)
+        finally:
+            self.cog.leave()
+
+    async def prepare_context(self, ctx):
+        ctx.currency = await self.cog.eco.get_currency(ctx.guild)
 
 
 class EconomyGroup(EconomyCommand, commands.Group):
@@ -333,16 +966,16 @@ class EconomyGroup(EconomyCommand, commands.Group):
 
 class EconomyGame(EconomyCommand, CooldownCommand):
     
-    async def invoke(self, ctx):
+    async def prepare_context(self, ctx):
         ctx.account = await self.cog.eco.get_money(ctx.author)
-        await super().invoke(ctx)
+        await super().prepare_context(ctx)
 
 
 class StoryGame(EconomyGame):
     
-    async def invoke(self, ctx):
+    async def prepare_context(self, ctx):
         ctx.game_config = await self.cog.eco.get_game_config(ctx)
-        await super().invoke(ctx)
+        await super().prepare_context(ctx)
 
     async def use(self, ctx):
         formatter = ContextFormatter(
@@ -547,6 +1180,88 @@ class Economy(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.eco = _Economy(bot)
+        # writes of the cog before a reload, nothing is read until they are done
+        self.unloaded = bot.unloading.get(self.qualified_name)
+        # commands and loops that may still save accounts into this cog's store
+        self.running = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.flush_accounts.start()
+        self.settle_income.start()
+        self.reconcile_totals.start()
+
+    async def warm_up(self):
+        timings = await self.eco.leaderboard.rebuild()
+        timings.update(await self.eco.totals.reconcile())
+        timings.update(await self.eco.incomes.load_all())
+        timings.update(await self.eco.configs.preload(
+            [guild.id for guild in self.bot.guilds]))
+
+        return timings
+
+    async def flush(self):
+        await self.eco.flush()
+
+    async def enter(self):
+        # called before a command or loop reads anything, the writes of the
+        # cog before a reload land first
+        self.running += 1
+        self.idle.clear()
+
+        if self.unloaded is not None and not self.unloaded.done():
+            try:
+                await asyncio.wait((self.unloaded, ))
+            except asyncio.CancelledError:
+                self.leave()
+                raise
+
+    def leave(self):
+        self.running -= 1
+
+        if not self.running:
+            self.idle.set()
+
+    async def unload(self):
+        await self.idle.wait()
+        await self.eco.flush()
+
+        # the game commands and their buckets are gone after a reload
+        await save_cooldowns(self.bot, collect_cooldowns(self.walk_commands()))
+
+    @tasks.loop(seconds=5, count=None)
+    async def flush_accounts(self):
+        await self.eco.flush()
+
+    @tasks.loop(minutes=10, count=None)
+    async def settle_income(self):
+        await self.bot.wait_until_ready()
+        await self.enter()
+
+        try:
+            # small guilds accrue lazily when an account is read
+            for guild in self.bot.guilds:
+                rules = await self.eco.incomes.get(guild.id)
+
+                if len(rules) >= EconomyConstants.INCOME_SETTLE_RULES:
+                    await self.eco.settle_income(guild)
+        finally:
+            self.leave()
+
+    @tasks.loop(minutes=30, count=None)
+    async def reconcile_totals(self):
+        await self.bot.wait_until_ready()
+        await self.enter()
+
+        try:
+            await self.eco.totals.reconcile()
+        finally:
+            self.leave()
+
+    def cog_unload(self):
+        self.flush_accounts.stop()
+        self.settle_income.stop()
+        self.reconcile_totals.stop()
+        self.bot.unloading[self.qualified_name] = self.bot.loop.create_task(self.unload())
 
     def currency_fmt(self, currency, amount):
         return "{}**{:3,}**".format(currency, amount)
@@ -671,68 +1386,71 @@ class Economy(commands.Cog):
         if member == ctx.author:
             return await ctx.answer(ctx.lang["errors"]["cant_use_to_yourself"])
         
-        author_account = await self.eco.get_money(ctx.author)
-        
-        if amount > author_account.cash:
+        if not await self.eco.transfer(ctx.guild, ctx.author, member, amount):
             return await ctx.answer(ctx.lang["economy"]["not_enough_cash"])
 
-        member_account = await self.eco.get_money(member)
-
-        author_account.cash -= amount
-        member_account.cash += amount
-
-        await author_account.save()
-        await member_account.save()
-
         await ctx.answer(ctx.lang["economy"]["add_money"].format(
             member.mention, self.currency_fmt(ctx.currency, amount), MoneyType.cash.name))
 
-    @commands.command(name="add-money", cls=EconomyCommand)
-    @is_commander()
-    async def add_money(self, ctx, member: discord.Member, money_type: MoneyTypeConverter, amount: uint):
-        account = await self.eco.get_money(member)
+    def bulk_target(self, ctx, role, affected):
+        if role is None or role.is_default():
+            return None, f"{ctx.lang['shared']['all_members']} ({affected})"
 
-        if money_type == MoneyType.bank:
-            account.bank += amount
-        elif money_type == MoneyType.cash:
-            account.cash += amount
+        return role.members, f"{role.mention} ({affected})"
 
-        await account.save()
+    @commands.command(name="add-money", cls=EconomyCommand)
+    @is_commander()
+    async def add_money(self, ctx, target: Union[discord.Member, discord.Role], money_type: MoneyTypeConverter, amount: uint):
+        if isinstance(target, discord.Member):
+            await self.eco.transfer(ctx.guild, None, target, amount, money_type.name)
+            mention = target.mention
+        else:
+            members, _ = self.bulk_target(ctx, target, 0)
+            affected = await self.eco.bulk_add(ctx.guild, members, money_type.name, amount)
+            _, mention = self.bulk_target(ctx, target, affected)
 
         await ctx.answer(ctx.lang["economy"]["add_money"].format(
-            member.mention, self.currency_fmt(ctx.currency, amount), money_type.name))
+            mention, self.currency_fmt(ctx.currency, amount), money_type.name))
 
     @commands.command(name="remove-money", cls=EconomyCommand)
     @is_commander()
-    async def remove_money(self, ctx, member: discord.Member, money_type: MoneyTypeConverter, amount: uint):
-        account = await self.eco.get_money(member)
+    async def remove_money(self, ctx, target: Union[discord.Member, discord.Role], money_type: MoneyTypeConverter, amount: uint):
+        # commanders may take members below zero
+        if isinstance(target, discord.Member):
+            await self.eco.transfer(ctx.guild, target, None, amount, money_type.name, overdraw=True)
+            mention = target.mention
+        else:
+            members, _ = self.bulk_target(ctx, target, 0)
+            affected = await self.eco.bulk_add(ctx.guild, members, money_type.name, -amount)
+            _, mention = self.bulk_target(ctx, target, affected)
 
-        if money_type == MoneyType.bank:
-            account.bank -= amount
-        elif money_type == MoneyType.cash:
-            account.cash -= amount
+        await ctx.answer(ctx.lang["economy"]["remove_money"].format(
+            mention, self.currency_fmt(ctx.currency, amount), money_type.name))
 
-        await account.save()
+    @commands.command(name="reset-money", cls=EconomyCommand)
+    @is_commander()
+    async def reset_money(self, ctx, money_type: MoneyTypeConverter, role: Optional[discord.Role], below: Optional[uint]):
+        members, _ = self.bulk_target(ctx, role, 0)
+        affected = await self.eco.bulk_reset(ctx.guild, members, money_type.name, below)
+        _, mention = self.bulk_target(ctx, role, affected)
 
-        await ctx.answer(ctx.lang["economy"]["remove_money"].format(
-            member.mention, self.currency_fmt(ctx.currency, amount), money_type.name))
+        await ctx.answer(ctx.lang["economy"]["reset_money"].format(mention, money_type.name))
 
-    @commands.command(name="delete-money")
+    @commands.command(name="delete-money", cls=EconomyCommand)
     @is_commander()
     async def delete_money(self, ctx, *, member: discord.Member):
         if await ctx.accept(ctx.lang["economy"]["really_delete?"].format(
                 markdown(member.name, "**"))):
             await ctx.answer(ctx.lang["economy"]["lost_all_money"].format(
                 member.mention))
-            await Account(self.bot, member).delete()
+
+            # the cached account carries what the totals and leaderboard counted
+            account = await self.eco.accounts.get(member)
+            await account.delete()
 
     @commands.group(name="start-money", cls=EconomyGroup, invoke_without_command=True)
     async def start_money(self, ctx):
-        start_money = await self.bot.db.execute(
-            "SELECT `cash`, `bank` FROM `start_money` WHERE `start_money`.`server` = ?",
-            ctx.guild.id)
-        
-        cash, bank = start_money or (0, 0)
+        cash, bank = await self.eco.configs.start_money(ctx.guild) or (0, 0)
 
         em = discord.Embed(colour=ctx.color)
         em.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon_url)
@@ -748,23 +1466,13 @@ class Economy(commands.Cog):
     @start_money.command(name="set", cls=EconomyCommand)
     @is_commander()
     async def start_money_set(self, ctx, money_type: MoneyTypeConverter, amount: uint(include_zero=True)):
-        update_sql = """
-        UPDATE `start_money` 
-        SET `{}` = ? 
-        WHERE `start_money`.`server` = ?
-        """
-        
-        check = await self.bot.db.execute(
-            update_sql.format(money_type.name),
-            amount, ctx.guild.id, with_commit=True)
+        await self.bot.db.upsert("start_money", ("server", ), {
+            "server": ctx.guild.id,
+            "cash": amount if money_type == MoneyType.cash else 0,
+            "bank": amount if money_type == MoneyType.bank else 0
+        }, update_columns=(money_type.name, ))
 
-        if not check:
-            await self.bot.db.execute(
-                "INSERT INTO `start_money` VALUES (?, ?, ?)",
-                ctx.guild.id, 
-                amount if money_type == MoneyType.cash else 0, 
-                amount if money_type == MoneyType.bank else 0,
-                with_commit=True)
+        self.eco.configs.invalidate(ctx.guild)
 
         await ctx.answer(ctx.lang["economy"]["start_money_set"].format(
             self.currency_fmt(ctx.currency, amount), money_type.name))
@@ -772,59 +1480,28 @@ class Economy(commands.Cog):
     @commands.command(cls=EconomyCommand)
     @is_commander()
     async def currency(self, ctx, symbol: discord.Emoji):
-        check = await self.bot.db.execute(
-            "UPDATE `currency` SET `symbol` = ? WHERE `currency`.`server` = ?",
-            symbol.id, ctx.guild.id, with_commit=True)
-        
-        if not check:
-            await self.bot.db.execute(
-                "INSERT INTO `currency` VALUES (?, ?)",
-                ctx.guild.id, symbol.id, with_commit=True)
+        await self.bot.db.upsert("currency", ("server", ), {
+            "server": ctx.guild.id,
+            "symbol": symbol.id
+        })
+
+        self.bot.guild_settings.invalidate(ctx.guild)
 
         await ctx.answer(ctx.lang["economy"]["new_symbol"].format(
             str(symbol), ctx.currency))
 
     @commands.command(aliases=["lb", "board", "top"], cls=EconomyCommand)
     async def leaderboard(self, ctx, page: Optional[IndexConverter]=Index(0)):
-        if self.bot.db.db_type == DbType.SQLite:
-            where = "WHERE `money`.`server` = ? AND `money_sum` > 0"
-        elif self.bot.db.db_type == DbType.MySQL:
-            where = "WHERE `money`.`server` = ?\nHAVING `money_sum` > 0"
-
-        sql = f"""
-        SELECT `member`, `money`.`cash` + `money`.`bank` AS `money_sum`
-        FROM `money`
-        {where}
-        ORDER BY `money_sum` DESC 
-        LIMIT ? OFFSET ?
-        """
+        snapshot = await self.eco.leaderboard.snapshot(ctx.guild.id)
+        check = snapshot.page(page.value, EconomyConstants.USER_PER_PAGE)
 
-        check = await self.bot.db.execute(sql,
-            ctx.guild.id, EconomyConstants.USER_PER_PAGE, 
-            EconomyConstants.USER_PER_PAGE * page.value,
-            fetch_all=True)
-
-        if check is None or len(check) == 0:
+        if len(check) == 0:
             return await ctx.answer(ctx.lang["economy"]["empty_page"].format(page.humanize()))
 
-        select_count_sql = """
-        SELECT COUNT(*) 
-        FROM `money` 
-        WHERE `money`.`server` = ? AND `money`.`cash` + `money`.`bank` > 0
-        """
-
-        count = await self.bot.db.execute(select_count_sql, ctx.guild.id)
-
-        place = None
         description = []
 
-        for member_id, money_sum in check:
+        for place, member_id, money_sum in check:
             member = ctx.guild.get_member(member_id)
-                
-            if place is None:
-                place = await self.eco.get_place(PseudoMember(member_id, ctx.guild))
-            else:
-                place += 1
 
             description.append("**{}**. {} {} {}".format(
                 place, (member and member.mention) or ctx.lang["shared"]["left_member"],
@@ -838,40 +1515,34 @@ class Economy(commands.Cog):
         em.set_footer(text="{} {}/{}".format(
             ctx.lang["shared"]["page"], 
             page.humanize(), 
-            ceil(count / EconomyConstants.USER_PER_PAGE)))
+            ceil(len(snapshot) / EconomyConstants.USER_PER_PAGE)))
 
         await ctx.send(embed=em)
 
     @commands.command(name="economy-stats", cls=EconomyCommand)
     async def economy_stats(self, ctx):
-        sql = """
-        SELECT SUM(`cash`), SUM(`bank`), COUNT(*)
-        FROM `money`
-        WHERE `money`.`server` = ?
-        """
-
-        money = await self.bot.db.execute(sql, ctx.guild.id) or (0, 0, 0)
+        totals = await self.eco.totals.get(ctx.guild.id)
 
         em = discord.Embed(colour=ctx.color)
         em.set_author(name=ctx.guild.name, icon_url=ctx.guild.icon_url)
-        em.set_footer(text=f"{ctx.lang['economy']['accounts']} {money[2]}")
+        em.set_footer(text=f"{ctx.lang['economy']['accounts']} {totals.count}")
 
         em.add_field(
             name=ctx.lang["economy"]["cash"], 
-            value=self.currency_fmt(ctx.currency, money[0]),
+            value=self.currency_fmt(ctx.currency, totals.cash),
             inline=False)
         em.add_field(
             name=ctx.lang["economy"]["bank"],
-            value=self.currency_fmt(ctx.currency, money[1]),
+            value=self.currency_fmt(ctx.currency, totals.bank),
             inline=False)
         em.add_field(
             name=ctx.lang["shared"]["sum"], 
-            value=self.currency_fmt(ctx.currency, sum(money[:2])),
+            value=self.currency_fmt(ctx.currency, totals.sum),
             inline=False)
         
         await ctx.send(embed=em)
 
-    @commands.command(name="economy-reset")
+    @commands.command(name="economy-reset", cls=EconomyCommand)
     @has_permissions(administrator=True)
     async def economy_reset(self, ctx):
         accept = await ctx.ask(ctx.lang["economy"]["really_reset?"].format(ctx.guild.name),
@@ -880,28 +1551,23 @@ class Economy(commands.Cog):
         if accept is None or accept == ctx.lang["shared"]["no"].lower():
             return
 
-        await self.bot.db.execute(
-            "DELETE FROM `money` WHERE `money`.`server` = ?",
-            ctx.guild.id, with_commit=True)
+        await self.eco.accounts.delete_guild(ctx.guild.id)
+
+        self.eco.leaderboard.drop(ctx.guild.id)
+        self.eco.totals.drop(ctx.guild.id)
 
         await ctx.answer(ctx.lang["economy"]["reset"])
 
     @commands.group(cls=EconomyGroup, invoke_without_command=True)
     @is_commander()
     async def income(self, ctx, *, member: discord.Member):
-        sql = """
-        SELECT `amount`, `is_percentage`, `interval`
-        FROM `income` 
-        WHERE `income`.`server` = ? AND `income`.`member` = ?
-        """
-
-        check = await self.bot.db.execute(sql, ctx.guild.id, member.id)
+        check = (await self.eco.incomes.get(ctx.guild.id)).get(member.id)
 
         if check is None:
             return await ctx.answer(ctx.lang["economy"]["no_income"].format(
                 member.mention))
 
-        value = IncomeValue(check[0], check[1])
+        value = IncomeValue(check.amount, check.is_percentage)
 
         em = discord.Embed(
             title=ctx.lang["economy"]["income_title"].format(member.name),
@@ -917,7 +1583,7 @@ class Economy(commands.Cog):
 
         em.add_field(
             name=ctx.lang["economy"]["interval"],
-            value=f"{check[2]} {ctx.lang['shared']['seconds']}",
+            value=f"{check.interval} {ctx.lang['shared']['seconds']}",
             inline=True)
 
         await ctx.send(embed=em)
@@ -925,24 +1591,8 @@ class Economy(commands.Cog):
     @income.command(aliases=["add"], name="set", cls=EconomyCommand)
     @is_commander()
     async def income_set(self, ctx, member: discord.Member, value: IncomeValueConverter, interval: HumanTime):
-        sql = """
-        UPDATE `income`
-        SET `amount` = ?, `interval` = ?, `is_percentage` = ?, `seen` = UNIX_TIMESTAMP()
-        WHERE `income`.`server` = ? AND `income`.`member` = ?
-        """
-
-        check = await self.bot.db.execute(
-            sql, value.amount, 
-            interval, value.is_percentage, 
-            ctx.guild.id, member.id,
-            with_commit=True)
-
-        if not check:
-            await self.bot.db.execute(
-                "INSERT INTO `income` VALUES (?, ?, ?, ?, ?, UNIX_TIMESTAMP())",
-                ctx.guild.id, member.id,
-                value.amount, value.is_percentage,
-                interval, with_commit=True)
+        await self.eco.incomes.set(ctx.guild.id, member.id, 
+            value.amount, value.is_percentage, interval)
 
         await ctx.answer(ctx.lang["economy"]["set_income"].format(
             member.mention, str(value) if value.is_percentage 
@@ -951,9 +1601,7 @@ class Economy(commands.Cog):
     @income.command(aliases=["delete"], name="remove", cls=EconomyCommand)
     @is_commander()
     async def income_remove(self, ctx, *, member: discord.Member):
-        check = await self.bot.db.execute(
-            "DELETE FROM `income` WHERE `income`.`server` = ? AND `income`.`member` = ?",
-            ctx.guild.id, member.id, with_commit=True)
+        check = await self.eco.incomes.remove(ctx.guild.id, member.id)
 
         if check:
             await ctx.answer(ctx.lang["economy"]["income_deleted"].format(
@@ -1014,6 +1662,9 @@ class Economy(commands.Cog):
             command.qualified_name, result_type.value,
             text, ctx.lang["lang_code"], with_commit=True)
 
+        self.eco.stories.add((ctx.guild.id, ctx.lang["lang_code"], 
+            command.qualified_name, result_type.value), (story_id, text))
+
         await ctx.answer(ctx.lang["economy"]["add_story"].format(story_id))
 
     @story.command(name="delete", aliases=["remove"])
@@ -1026,9 +1677,12 @@ class Economy(commands.Cog):
         if not check:
             await ctx.answer(ctx.lang["economy"]["no_story"].format(story_id))
         else:
+            # old data may repeat an id, so every pick list of the guild is read again
+            self.eco.stories.invalidate(lambda key: key[0] == ctx.guild.id)
+
             await ctx.answer(ctx.lang["economy"]["delete_story"].format(story_id))
 
-    @commands.command()
+    @commands.command(cls=EconomyCommand)
     @is_commander()
     async def chance(self, ctx, command: CommandConverter(cls=EconomyGame), new_chance: Optional[uint]):
         if new_chance is None:
@@ -1105,20 +1759,18 @@ class Economy(commands.Cog):
             if member_account.cash > 0:
                 money = ceil(member_account.cash / 100 * ctx.game_config.rolled_chance)
 
-            member_account.cash -= money
-            ctx.account.cash += money
-
-            await member_account.save()
+            # a member without cash goes into debt, anyone else can't lose more than they have
+            if not await self.eco.transfer(ctx.guild, member, ctx.author, money, 
+                    overdraw=member_account.cash <= 0):
+                money = 0
         else:
             if ctx.account.cash > 0:
                 money = ceil(ctx.account.cash / 100 * ctx.game_config.rolled_chance)
 
-            ctx.account.cash -= money
+            await self.eco.transfer(ctx.guild, ctx.author, None, money, overdraw=True)
 
         ctx.game_config.rolled_reward = money
-
         await ctx.command.use(ctx)
-        await ctx.account.save()
 
     @commands.command(aliases=["bj"], cls=EconomyGame)
     @custom_cooldown()
@@ -1290,7 +1942,7 @@ class Economy(commands.Cog):
         await ctx.send(embed=em)
         await ctx.account.save()
 
-    @commands.group(invoke_without_command=True)
+    @commands.group(cls=EconomyGroup, invoke_without_command=True)
     async def item(self, ctx, *, item: ShopItemConverter):
         em = discord.Embed(
             description=ctx.lang["economy"]["item"], 
@@ -1317,7 +1969,7 @@ class Economy(commands.Cog):
 
         await ctx.send(embed=em)
 
-    @item.command(name="create")
+    @item.command(name="create", cls=EconomyCommand)
     @is_commander()
     async def item_create(self, ctx):
         timeout = dt.timedelta(minutes=len(ShopItem.properties))
@@ -1334,11 +1986,9 @@ class Economy(commands.Cog):
         await ctx.answer(ctx.lang["economy"]["item_created"].format(
             item_props[0]))
 
-        await self.bot.db.execute(
-            "INSERT INTO `shop_items` VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            ctx.guild.id, ctx.author.id, 0, *item_props, with_commit=True)
+        await self.eco.shop.create(ctx.guild.id, ctx.author.id, item_props)
 
-    @item.command(name="edit")
+    @item.command(name="edit", cls=EconomyCommand)
     @is_commander()
     async def item_edit(self, ctx, *, item: ShopItemConverter):
         allowed_props = ctx.lang["economy"]["item_properties"].values()
@@ -1360,25 +2010,12 @@ class Economy(commands.Cog):
         await ctx.answer(ctx.lang["economy"]["property_changed"].format(
             to_edit, item.name))
 
-        update_sql = """
-        UPDATE `shop_items` 
-        SET `{}` = ? 
-        WHERE `shop_items`.`server` = ? AND `shop_items`.`name` = ?
-        """
-
-        await self.bot.db.execute(update_sql.format(translated), 
-            new_value, ctx.guild.id, item.name, with_commit=True)
+        await self.eco.shop.edit(ctx.guild.id, item.name, translated, new_value)
 
-    @item.command(name="delete")
+    @item.command(name="delete", cls=EconomyCommand)
     @is_commander()
     async def item_delete(self, ctx, *, item: ShopItemConverter):
-        delete_sql = """
-        DELETE FROM `shop_items` 
-        WHERE `shop_items`.`server` = ? AND `shop_items`.`name` = ?
-        """
-
-        check = await self.bot.db.execute(
-            delete_sql, ctx.guild.id, item.name, with_commit=True)
+        check = await self.eco.shop.delete(ctx.guild.id, item.name)
 
         if check:
             await ctx.answer(ctx.lang["economy"]["item_deleted"].format(
@@ -1389,27 +2026,14 @@ class Economy(commands.Cog):
     
     @commands.command(cls=EconomyCommand, aliases=["store"])
     async def shop(self, ctx, page: Optional[IndexConverter] = Index(0)):
-        select_sql = """
-        SELECT `author`, `role`, `name`, `description`, `price`, `buy_count`, `stock`
-        FROM `shop_items`
-        WHERE `shop_items`.`server` = ?
-        ORDER BY `shop_items`.`price` DESC
-        LIMIT ? OFFSET ?
-        """
-        
-        check = await self.bot.db.execute(
-            select_sql, ctx.guild.id,
-            EconomyConstants.SHOP_PAGE_MAX_LEX,
-            EconomyConstants.SHOP_PAGE_MAX_LEX * page.value, 
-            fetch_all=True)
+        catalog = await self.eco.shop.get(ctx.guild.id)
+        check = catalog.page(page.value, EconomyConstants.SHOP_PAGE_MAX_LEX)
 
         if not len(check):
             return await ctx.answer(ctx.lang["economy"]["no_items_on_page"].format(
                 page.humanize()))
 
-        count = await self.bot.db.execute(
-            "SELECT COUNT(*) FROM `shop_items` WHERE `shop_items`.`server` = ?",
-            ctx.guild.id)
+        count = len(catalog)
 
         em = discord.Embed(
             title=ctx.lang["economy"]["shop"].format(ctx.guild.name), 
@@ -1421,7 +2045,7 @@ class Economy(commands.Cog):
             *fields, guild=ctx.guild, 
             member=ctx.author, currency=ctx.currency)
 
-        for author_id, role_id, name, desc, price, buy_count, stock in check:
+        for author_id, buy_count, name, price, desc, role_id, stock, *_ in check:
             formatter.ctx["item"] = context_item( 
                 name, price, buy_count, stock or StringConstants.INFINITY, 
                 ctx.guild.get_member(author_id), ctx.guild.get_role(role_id))
@@ -1448,7 +2072,8 @@ class Economy(commands.Cog):
             return await ctx.answer(ctx.lang["economy"]["over_stock"].format(
                 item.name))
 
-        if ctx.account.cash < item.price:
+        # the check and the debit happen together, so concurrent buys can't overdraw
+        if not await self.eco.transfer(ctx.guild, ctx.author, None, item.price, "cash"):
             return await ctx.answer(ctx.lang["economy"]["not_enough_cash"])
         
         dm_channel = ctx.author.dm_channel or await ctx.author.create_dm()
@@ -1477,18 +2102,7 @@ class Economy(commands.Cog):
             await ctx.author.add_roles(
                 item.role, reason=ctx.lang["economy"]["shop_reward"])
 
-        ctx.account.cash -= item.price
-        await ctx.account.save()
-
-        update_sql = """
-        UPDATE `shop_items`
-        SET `buy_count` = `buy_count` + 1
-        WHERE `shop_items`.`server` = ? AND `shop_items`.`name` = ?
-        """
-
-        await self.bot.db.execute(
-            update_sql, ctx.guild.id, 
-            item.name, with_commit=True)
+        self.eco.shop.bought(ctx.guild.id, item.name)
 
 
 def setup(bot):
@@ -110,28 +110,16 @@ class EmojiRoles(commands.Cog):
                     str(emoji), emoji_role.mention
                 ))
 
-        if emoji_role is None:
-            await self.bot.db.execute(
-                "INSERT INTO `emoji_roles` VALUES (?, ?, ?, ?)",
-                ctx.guild.id,
-                message.id,
-                role.id,
-                str(emoji_id),
-                with_commit=True
-            )
-        else:
-            await self.bot.db.execute(
-                """
-                UPDATE `emoji_roles`
-                SET `role_id` = ?
-                WHERE `guild_id` = ? AND `message_id` = ? WHERE `emoji_id` = ?
-                """,
-                role.id,
-                ctx.guild.id,
-                message.id,
-                str(emoji_id),
-                with_commit=True
-            )
+        await self.bot.db.upsert(
+            "emoji_roles",
+            ("guild_id", "message_id", "emoji_id"),
+            {
+                "guild_id": ctx.guild.id,
+                "message_id": message.id,
+                "role_id": role.id,
+                "emoji_id": str(emoji_id)
+            }
+        )
 
         await message.add_reaction(emoji)
         await ctx.answer(ctx.lang["emroles"]["role"].format(str(emoji), role.mention))
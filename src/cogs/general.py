@@ -2,6 +2,7 @@ import discord
 
 from discord.ext import commands
 from typing import Optional, Union
+from time import perf_counter
 
 from .utils.checks import is_commander
 from .utils.strings import markdown
@@ -17,12 +18,12 @@ class General(commands.Cog):
             for c in self.bot.config.required_commands)
 
     async def _settings_pattern(self, ctx, table: str, field: str, new_value: str, message: str):
-        check = await self.bot.db.execute(f"UPDATE `{table}` SET `{field}` = ? WHERE `{table}`.`server` = ?",
-            new_value, ctx.guild.id, with_commit=True)
+        await self.bot.db.upsert(table, ("server", ), {
+            "server": ctx.guild.id,
+            field: new_value
+        })
 
-        if not check:
-            await self.bot.db.execute(f"INSERT INTO `{table}` VALUES (?, ?)",
-                ctx.guild.id, new_value, with_commit=True)
+        self.bot.guild_settings.invalidate(ctx.guild)
 
         await ctx.answer(message)
 
@@ -64,23 +65,23 @@ class General(commands.Cog):
             "DELETE FROM `colors` WHERE `colors`.`server` = ?",
             ctx.guild.id, with_commit=True)
 
+        self.bot.guild_settings.invalidate(ctx.guild)
+
     @embed_color.command(name="random")
     @is_commander()
     async def embed_color_random(self, ctx):
         await ctx.answer(ctx.lang["general"]["color_set_to_random"])
-        check = await self.bot.db.execute(
-            "UPDATE `colors` SET `color` = ? WHERE `colors`.`server` = ?",
-            "rnd", ctx.guild.id, with_commit=True)
+        await self.bot.db.upsert("colors", ("server", ), {
+            "server": ctx.guild.id,
+            "color": "rnd"
+        })
 
-        if not check:
-            await self.bot.db.execute(
-                "INSERT INTO `colors` VALUES (?, ?)", 
-                ctx.guild.id, "rnd", with_commit=True)
+        self.bot.guild_settings.invalidate(ctx.guild)
 
     async def _role_setup_pattern(self, ctx, role: discord.Role, table: str, no_key: str, is_key: str, new_key: str):
         if role is None:
-            check = await self.bot.db.execute(f"SELECT `role` FROM `{table}` WHERE `{table}`.`server` = ?",
-                ctx.guild.id)
+            settings = await self.bot.guild_settings.get(ctx.guild)
+            check = settings.commander if table == "commanders" else settings.moderator
 
             checked_role = ctx.guild.get_role(check)
 
@@ -96,6 +97,8 @@ class General(commands.Cog):
         await self.bot.db.execute(f"DELETE FROM `{table}` WHERE `{table}`.`server` = ?",
             ctx.guild.id, with_commit=True)
 
+        self.bot.guild_settings.invalidate(ctx.guild)
+
         await ctx.answer(ctx.lang["general"][deleted_key])
 
     @commands.group(invoke_without_command=True)
@@ -148,13 +151,7 @@ class General(commands.Cog):
                 await ctx.answer(ctx.lang["general"]["cog_enabled"].format(
                     cmd_or_cog.qualified_name))
 
-            check = await self.bot.db.execute(
-                "UPDATE `disable` SET `disabled` = ? WHERE `server` = ? AND `command` = ?",
-                False, ctx.guild.id, cmd_or_cog.qualified_name,
-                with_commit=True)
-
-            if not check:
-                await set_disable_state(ctx, cmd_or_cog, False)
+            await set_disable_state(ctx, cmd_or_cog, False)
         else:
             if isinstance(cmd_or_cog, commands.Command):
                 await ctx.answer(ctx.lang["general"]["cmd_disabled"].format(
@@ -163,21 +160,19 @@ class General(commands.Cog):
                 await ctx.answer(ctx.lang["general"]["cog_disabled"].format(
                     cmd_or_cog.qualified_name))
 
-            if ctx.guild.id not in cmd_or_cog.disabled_in:
-                await set_disable_state(ctx, cmd_or_cog, True)
+            await set_disable_state(ctx, cmd_or_cog, True)
 
             cmd_or_cog.disabled_in[ctx.guild.id] = True
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        await self.bot.wait_until_ready()
+    async def warm_up(self):
+        started = perf_counter()
 
         disables = await self.bot.db.execute(
             "SELECT * FROM `disable`", 
             fetch_all=True)
 
         if disables is None:
-            return  
+            return {}
 
         models = {}
 
@@ -209,6 +204,8 @@ class General(commands.Cog):
             set_disabled(model)
             model.disabled_in[guild_id] = bool(is_disabled)
 
+        return {"disable": perf_counter() - started}
+
 
 def setup(bot):
     bot.add_cog(General(bot))
\ No newline at end of file
@@ -12,10 +12,9 @@ class Logging(commands.Cog):
         self.bot = bot
 
     async def get_log_channel(self, guild):
-        check = await self.bot.db.execute("SELECT `channel` FROM `log` WHERE `log`.`server` = ?",
-            guild.id)
+        channel_id = (await self.bot.guild_settings.get(guild)).log
 
-        return guild.get_channel(check)
+        return guild.get_channel(channel_id)
 
     @commands.group(invoke_without_command=True)
     @is_commander()
@@ -28,12 +27,12 @@ class Logging(commands.Cog):
             else:
                 await ctx.answer(ctx.lang["logging"]["is_log_channel"].format(log_channel.mention))
         else:
-            check = await self.bot.db.execute("UPDATE `log` SET `channel` = ? WHERE `log`.`server` = ?",
-                channel.id, ctx.guild.id, with_commit=True)
+            await self.bot.db.upsert("log", ("server", ), {
+                "server": ctx.guild.id,
+                "channel": channel.id
+            })
 
-            if not check:
-                await self.bot.db.execute("INSERT INTO `log` VALUES (?, ?)",
-                    ctx.guild.id, channel.id, with_commit=True)
+            self.bot.guild_settings.invalidate(ctx.guild)
 
             await ctx.answer(ctx.lang["logging"]["new_log_channel"].format(channel.mention))
 
@@ -42,6 +41,8 @@ class Logging(commands.Cog):
     async def log_delete(self, ctx):
         check = await self.bot.db.execute("DELETE FROM `log` WHERE `server` = ?",
             ctx.guild.id, with_commit=True)
+
+        self.bot.guild_settings.invalidate(ctx.guild)
         
         if not check:
             await ctx.answer(ctx.lang["logging"]["no_log_channel"])
@@ -6,7 +6,7 @@ from discord.ext import commands
 from enum import Enum
 from datetime import timedelta
 from typing import Optional
-from collections import namedtuple
+from collections import namedtuple, defaultdict
 from math import ceil
 
 from .utils.time import UnixTime
@@ -43,18 +43,17 @@ class MuteRoles:
         for channel in filter(lambda x: x.type == discord.ChannelType.text, role.guild.channels):
             await channel.set_permissions(role, overwrite=self.overwrite)
 
-        check = await self.bot.db.execute("UPDATE `mute_roles` SET `role` = ? WHERE `mute_roles`.`server` = ?",
-            role.id, role.guild.id, with_commit=True)
+        await self.bot.db.upsert("mute_roles", ("server", ), {
+            "server": role.guild.id,
+            "role": role.id
+        })
 
-        if not check:
-            await self.bot.db.execute("INSERT INTO `mute_roles` VALUES (?, ?)",
-                role.guild.id, role.id, with_commit=True)
+        self.bot.guild_settings.invalidate(role.guild)
 
         return role
 
     async def get_mute_role(self, guild: discord.Guild):
-        role_id = await self.bot.db.execute("SELECT `role` FROM `mute_roles` WHERE `mute_roles`.`server` = ?",
-            guild.id)
+        role_id = (await self.bot.guild_settings.get(guild)).mute_role
 
         role = guild.get_role(role_id) or await self.setup_mute_role(guild=guild)
         
@@ -139,6 +138,9 @@ class Moderation(commands.Cog):
         self.bot = bot
         self.roles = MuteRoles(bot)
         self.mute_pool = MutePool(bot.loop, self.roles)
+        # guild id -> lock around picking the next case id, gap locks of
+        # a locking read would deadlock concurrent cases on mysql
+        self.case_locks = defaultdict(asyncio.Lock)
 
     async def log_entry(self, ctx, entry_type: EntryType, member: discord.Member, info: ActionInfo):
         query = f"""
@@ -151,20 +153,21 @@ class Moderation(commands.Cog):
         FROM `cases`
         WHERE `cases`.`server` = {ctx.guild.id}"""
 
-        case_id = await self.bot.db.execute(query)
+        async with self.case_locks[ctx.guild.id], self.bot.db.transaction():
+            case_id = await self.bot.db.execute(query)
 
-        await self.bot.db.execute(f"INSERT INTO `cases` VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            case_id, ctx.guild.id,
-            ctx.author.id, member.id, 
-            entry_type.name, int(info.time.timestamp),
-            info.reason, False, with_commit=True)
+            await self.bot.db.execute(f"INSERT INTO `cases` VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                case_id, ctx.guild.id,
+                ctx.author.id, member.id, 
+                entry_type.name, int(info.time.timestamp),
+                info.reason, False, with_commit=True)
 
-        if entry_type == EntryType.Unmute:
-            last_mute_id = await self.bot.db.execute("SELECT MAX(`id`) FROM `cases` WHERE `cases`.`server` = ? AND `cases`.`member` = ? AND `cases`.`type` = ?",
-                ctx.guild.id, member.id, EntryType.Mute.name)
+            if entry_type == EntryType.Unmute:
+                last_mute_id = await self.bot.db.execute("SELECT MAX(`id`) FROM `cases` WHERE `cases`.`server` = ? AND `cases`.`member` = ? AND `cases`.`type` = ?",
+                    ctx.guild.id, member.id, EntryType.Mute.name)
 
-            await self.bot.db.execute("UPDATE `cases` SET `removed` = ? WHERE `cases`.`id` = ?",
-                True, last_mute_id, with_commit=True)
+                await self.bot.db.execute("UPDATE `cases` SET `removed` = ? WHERE `cases`.`id` = ?",
+                    True, last_mute_id, with_commit=True)
 
     @commands.command()
     @bot_has_permissions(manage_roles=True, manage_channels=True)
@@ -231,6 +234,8 @@ class Moderation(commands.Cog):
         check = await self.bot.db.execute("DELETE FROM `mute_roles` WHERE `mute_roles`.`server` = ?",
             ctx.guild.id, with_commit=True)
 
+        self.bot.guild_settings.invalidate(ctx.guild)
+
         if check:
             await ctx.answer(ctx.lang["moderation"]["mute_role_delete"])
         else:
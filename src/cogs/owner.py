@@ -4,10 +4,12 @@ import os
 
 from discord.ext import commands
 from pathlib import Path
+from typing import Optional
 
 from .utils.plugin_loader import LoaderCommands
 from .utils.checks import is_owner
-from .utils.converters import EnumConverter
+from .utils.converters import EnumConverter, uint
+from .utils.constants import OwnerConstants
 
 
 def insert_returns(body):
@@ -48,6 +50,7 @@ class Owner(commands.Cog):
     async def unload_cog(self, ctx, *, cog: str):
         try:
             self.bot.unload_extension(cog)
+            await self.bot.wait_unloaded()
             await ctx.answer(ctx.lang["owner"]["unload_success"].format(cog))
         except Exception as e:
             await ctx.answer(f"{type(e).__name__}\n{e}")
@@ -57,6 +60,7 @@ class Owner(commands.Cog):
     async def reload_cog(self, ctx, *, cog: str):
         try:
             self.bot.reload_extension(cog)
+            await self.bot.wait_unloaded()
             await ctx.answer(ctx.lang["owner"]["reload_success"].format(cog))
         except Exception as e:
             await ctx.answer(f"{type(e).__name__}\n{str(e)}")
@@ -116,6 +120,61 @@ class Owner(commands.Cog):
         await ctx.answer(ctx.lang["owner"]["loader_command_executed"].format(
             command.name))
 
+    @commands.group(invoke_without_command=True)
+    @is_owner()
+    async def queries(self, ctx, count: Optional[uint] = 10, sort: str = "total"):
+        if self.bot.db.stats is None:
+            return await ctx.answer(ctx.lang["owner"]["stats_disabled"])
+
+        if sort not in self.bot.db.stats.sort_keys:
+            return await ctx.answer(ctx.lang["owner"]["stats_sort_keys"].format(
+                ', '.join(self.bot.db.stats.sort_keys)))
+
+        count = min(count, OwnerConstants.QUERIES_MAX_COUNT)
+        lines = []
+
+        for stats in self.bot.db.stats.top(count, sort):
+            lines.append("{calls}x {total_ms}ms p50 {p50_ms}ms p99 {p99_ms}ms {rows} rows\n{}".format(
+                stats["statement"][:150], **stats))
+
+        text = '\n\n'.join(lines) or '-'
+
+        await ctx.answer(f"```sql\n{text[:1900]}```")
+
+    @queries.command(name="export")
+    @is_owner()
+    async def queries_export(self, ctx, *, path: str = "query_stats.json"):
+        if self.bot.db.stats is None:
+            return await ctx.answer(ctx.lang["owner"]["stats_disabled"])
+
+        count = self.bot.db.stats.export(path)
+
+        await ctx.answer(ctx.lang["owner"]["stats_exported"].format(
+            count, Path(path).resolve()))
+
+    @queries.command(name="reset")
+    @is_owner()
+    async def queries_reset(self, ctx):
+        if self.bot.db.stats is not None:
+            self.bot.db.stats.reset()
+
+        await ctx.answer(ctx.lang["owner"]["stats_reset"])
+
+    @commands.command()
+    @is_owner()
+    async def caches(self, ctx):
+        settings = self.bot.guild_settings
+        lines = [ctx.lang["owner"]["cache_guild_settings"].format(
+            settings.hit_ratio, settings.hits, settings.hits + settings.misses, len(settings))]
+
+        economy = self.bot.get_cog("Economy")
+
+        if economy is not None:
+            lines.append(ctx.lang["owner"]["cache_economy_configs"].format(len(economy.eco.configs)))
+            lines.append(ctx.lang["owner"]["cache_economy_accounts"].format(len(economy.eco.accounts)))
+
+        await ctx.answer("```{}```".format('\n'.join(lines)))
+
 
 def setup(bot):
     bot.add_cog(Owner(bot))
\ No newline at end of file
@@ -39,8 +39,7 @@ class RoleManager(commands.Cog):
     @commands.group(name="rm", invoke_without_command=True)
     @is_commander(manage_roles=True)
     async def role_manager(self, ctx):
-        enabled = await self.bot.db.execute("SELECT `enabled` FROM `rm_enabled` WHERE `rm_enabled`.`server` = ?",
-            ctx.guild.id)
+        enabled = (await self.bot.guild_settings.get(ctx.guild)).rm_enabled
 
         if enabled is None:
             enabled = False
@@ -73,12 +72,15 @@ class RoleManager(commands.Cog):
         toggled = await self.bot.db.execute("UPDATE `rm_enabled` SET `enabled` = NOT `enabled` WHERE `rm_enabled`.`server` = ?",
             ctx.guild.id, with_commit=True)
 
+        if not toggled:
+            await self.bot.db.execute("INSERT INTO `rm_enabled` VALUES (?, ?)",
+                ctx.guild.id, True, with_commit=True)
+
+        self.bot.guild_settings.invalidate(ctx.guild)
+
         if toggled:
             await ctx.answer(ctx.lang["rm"]["toggled"])
         else:
-            await self.bot.db.execute("INSERT INTO `rm_enabled` VALUES (?, ?)",
-                ctx.guild.id, True, with_commit=True)
-            
             await ctx.answer(ctx.lang["rm"]["now_enabled"])
 
     @role_manager.command(name="ignore")
@@ -108,8 +110,7 @@ class RoleManager(commands.Cog):
         if not member.guild.me.guild_permissions.manage_roles:
             return
 
-        enabled = await self.bot.db.execute("SELECT `enabled` FROM `rm_enabled` WHERE `rm_enabled`.`server` = ?",
-            member.guild.id)
+        enabled = (await self.bot.guild_settings.get(member.guild)).rm_enabled
 
         if not enabled:
             return
@@ -149,8 +150,7 @@ class RoleManager(commands.Cog):
         if not member.guild.me.guild_permissions.manage_roles:
             return
         
-        enabled = await self.bot.db.execute("SELECT `enabled` FROM `rm_enabled` WHERE `rm_enabled`.`server` = ?",
-            member.guild.id)
+        enabled = (await self.bot.guild_settings.get(member.guild)).rm_enabled
 
         if not enabled:
             return
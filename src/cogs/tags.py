@@ -8,12 +8,18 @@ from .utils.converters import IndexConverter, Index
 from .utils.strings import markdown
 from .utils.time import UnixTime
 from .utils.constants import TagsConstants
+from .utils.sampler import RandomSampler
 
 
 class Tags(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        # (member id, name) of every tag
+        self.tag_keys = RandomSampler(self._load_tag_keys)
+
+    async def _load_tag_keys(self, key):
+        return await self.bot.db.execute("SELECT `member`, `name` FROM `tags`", fetch_all=True) or ()
 
     @commands.group(invoke_without_command=True, aliases=['t'])
     async def tag(self, ctx, *, name: commands.clean_content):
@@ -75,6 +81,8 @@ class Tags(commands.Cog):
             await self.bot.db.execute("INSERT INTO `tags` VALUES (?, ?, ?, ?, UNIX_TIMESTAMP())",
                 ctx.message.author.id, name, content, 0, with_commit=True)
 
+            self.tag_keys.add(None, (ctx.message.author.id, name))
+
             return await ctx.answer(ctx.lang["tags"]["created"].format(name))
 
         await ctx.answer(ctx.lang["tags"]["already_created"].format(name))
@@ -85,16 +93,31 @@ class Tags(commands.Cog):
             ctx.author.id, name, with_commit=True)
 
         if check:
+            self.tag_keys.discard(None, (ctx.author.id, name))
+
             await ctx.answer(ctx.lang["tags"]["deleted"].format(name))
         else:
             await ctx.answer(ctx.lang["tags"]["no"].format(name))
 
     @tag.command(name="random")
     async def tag_random(self, ctx):
-        check = await self.bot.db.execute("SELECT `member`, `name`, `content` FROM `tags` ORDER BY RAND() LIMIT 1")
+        while True:
+            tag_key = await self.tag_keys.choice()
+
+            if tag_key is None:
+                return await ctx.answer(ctx.lang["tags"]["no_tags"])
+
+            check = await self.bot.db.execute("SELECT `content` FROM `tags` WHERE `tags`.`member` = ? AND `tags`.`name` = ?",
+                *tag_key)
+
+            if check is not None:
+                break
+
+            # the tag was deleted after the keys were read, every miss shrinks the set
+            self.tag_keys.discard(None, tag_key)
 
-        user = self.bot.get_user(check[0])
-        fmt = f"{str(user)} - {check[1]}\n\n{check[2]}"
+        user = self.bot.get_user(tag_key[0])
+        fmt = f"{str(user)} - {tag_key[1]}\n\n{check}"
 
         await ctx.send(fmt)
 
@@ -190,16 +190,10 @@ class TwitchAlerts(commands.Cog):
         return result
 
     async def set_anonse_channel(self, new_channel):
-        check = await self.bot.db.execute(
-            "UPDATE `twitch_channels` SET `channel` = ? WHERE `twitch_channels`.`server` = ?",
-            new_channel.id, new_channel.guild.id,
-            with_commit=True)
-
-        if not check:
-            await self.bot.db.execute(
-                "INSERT INTO `twitch_channels` VALUES (?, ?)",
-                new_channel.guild.id, new_channel.id,
-                with_commit=True)
+        await self.bot.db.upsert("twitch_channels", ("server", ), {
+            "server": new_channel.guild.id,
+            "channel": new_channel.id
+        })
 
     async def get_twitch_channel(self, username):
         return await self.api.req(
@@ -360,18 +354,11 @@ class TwitchAlerts(commands.Cog):
             avatar=await avatar_asset.read()
         )
 
-        if webhook_id is None:
-            await self.bot.db.execute(
-                "INSERT INTO `twitch_webhooks` VALUES (?, ?, ?)",
-                ctx.guild.id, str(new_webhook.id), new_webhook.token,
-                with_commit=True
-            )
-        else:
-            await self.bot.db.execute(
-                "UPDATE `twitch_webhooks` SET `id` = ?, `token` = ? WHERE `server` = ?",
-                str(new_webhook.id), new_webhook.token, ctx.guild.id,
-                with_commit=True
-            )
+        await self.bot.db.upsert("twitch_webhooks", ("server", ), {
+            "server": ctx.guild.id,
+            "id": str(new_webhook.id),
+            "token": new_webhook.token
+        })
 
         await ctx.answer(ctx.lang["twitch"]["webhook_set"].format(
             channel.mention
@@ -62,8 +62,7 @@ def is_commander(*, check=all, **perms):
         if ctx.bot.is_owner(ctx.author):
             return True
 
-        role_id = await ctx.bot.db.execute("SELECT `role` FROM `commanders` WHERE `commanders`.`server` = ?", 
-            ctx.guild.id)
+        role_id = (await ctx.bot.guild_settings.get(ctx.guild)).commander
 
         if role_id is not None:
             role = ctx.message.guild.get_role(role_id) 
@@ -85,8 +84,7 @@ def is_moderator(*, check=all, **perms):
         if ctx.bot.is_owner(ctx.author):
             return True
 
-        role_id = await ctx.bot.db.execute("SELECT `role` FROM `moderators` WHERE `moderators`.`server` = ?", 
-            ctx.guild.id)
+        role_id = (await ctx.bot.guild_settings.get(ctx.guild)).moderator
 
         if role_id is not None:
             role = ctx.message.guild.get_role(role_id)
@@ -76,6 +76,7 @@ class EconomyConstants:
     }
     SHOP_PAGE_MAX_LEX = 6
     ITEM_MAX_LEN = 50
+    INCOME_SETTLE_RULES = 100
 
 
 class TwitchAlertsConstants:
@@ -95,6 +96,11 @@ class FunConstants:
     OMEGALUL_EMOJI = "<:OMEGALUL:707305786128334849>"
 
 
+class OwnerConstants:
+
+    QUERIES_MAX_COUNT = 25
+
+
 class InfoConstants:
 
     GHUB_API_URL = "https://api.github.com"
@@ -1,34 +1,211 @@
-import discord
-import asyncio
 import datetime
+import heapq
 
 from discord.ext import commands
+from time import monotonic, perf_counter
+
+from .db import int_timestamp
+
+
+def monotonic_seconds() -> int:
+    return int(monotonic())
+
+
+class CooldownConfig:
+
+    def __init__(self, default):
+        self.default = tuple(default)
+        # (guild id, command name) -> (max uses, reset seconds)
+        self._config = {}
+
+    def get(self, guild_id, command_name):
+        return self._config.get((guild_id, command_name), self.default)
+
+    def set(self, guild_id, command_name, max_uses, reset_seconds):
+        self._config[(guild_id, command_name)] = (max_uses, reset_seconds)
+
+    async def load(self, db):
+        started = perf_counter()
+        rows = await db.execute(
+            "SELECT `server`, `command`, `max_uses`, `reset_seconds` FROM `cooldown`",
+            fetch_all=True)
+
+        for guild_id, command_name, max_uses, reset_seconds in rows or ():
+            self.set(guild_id, command_name, max_uses, reset_seconds)
+
+        return {"cooldown": perf_counter() - started}
+
+
+class CooldownBuckets:
+
+    default_max_buckets = 100000
+
+    def __init__(self, max_buckets=None):
+        self.max_buckets = max_buckets or self.default_max_buckets
+        self._buckets = {}
+        # guild id -> {user id: bucket}
+        self._guilds = {}
+        # (deadline, guild id, user id), a bucket is pushed again whenever its
+        # deadline moves and only the entry in _scheduled counts
+        self._deadlines = []
+        # (guild id, user id) -> deadline of the bucket's current heap entry
+        self._scheduled = {}
+        # keys of the buckets changed since the last snapshot
+        self._dirty = set()
+        # guild id -> {user id: (remaining uses, unix reset time)} read from the last snapshot
+        self._restored = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def __iter__(self):
+        return iter(self._buckets.values())
+
+    def get(self, guild_id, user_id):
+        return self._buckets.get((guild_id, user_id))
+
+    def add(self, bucket):
+        self.sweep()
+
+        # the bucket closest to its reset goes first
+        while len(self._buckets) >= self.max_buckets:
+            entry = self._pop_scheduled()
+
+            if entry is None:
+                break
+
+            _, guild_id, user_id = entry
+            self.remove(guild_id, user_id)
+
+        self._buckets[(bucket.guild_id, bucket.user_id)] = bucket
+        self._guilds.setdefault(bucket.guild_id, {})[bucket.user_id] = bucket
+
+        self._schedule(bucket)
+
+    def touch(self, bucket):
+        key = (bucket.guild_id, bucket.user_id)
+        self._dirty.add(key)
+
+        # a use may have moved the deadline
+        if self._buckets.get(key) is bucket:
+            self._schedule(bucket)
+
+    def _schedule(self, bucket):
+        key = (bucket.guild_id, bucket.user_id)
+
+        if self._scheduled.get(key) == bucket.reset_deadline:
+            return
+
+        self._scheduled[key] = bucket.reset_deadline
+        heapq.heappush(self._deadlines, (bucket.reset_deadline, *key))
+
+        # outdated entries are dropped once they outnumber the buckets
+        if len(self._deadlines) > 2 * len(self._scheduled) + 64:
+            self._deadlines = [(deadline, *key) for key, deadline in self._scheduled.items()]
+            heapq.heapify(self._deadlines)
+
+    def _pop_scheduled(self):
+        # the earliest entry that is still current, with the bucket's real deadline
+        while len(self._deadlines):
+            deadline, guild_id, user_id = heapq.heappop(self._deadlines)
+
+            if self._scheduled.get((guild_id, user_id)) != deadline:
+                continue
+
+            bucket = self._buckets[(guild_id, user_id)]
+
+            if bucket.reset_deadline == deadline:
+                return deadline, guild_id, user_id
+
+            del self._scheduled[(guild_id, user_id)]
+            self._schedule(bucket)
+
+        return None
+
+    def is_restored(self, guild_id):
+        return guild_id in self._restored
+
+    def restore(self, guild_id, rows):
+        self._restored[guild_id] = {
+            user_id: (remaining_uses, reset_at)
+            for user_id, remaining_uses, reset_at in rows}
+
+    def pop_restored(self, guild_id, user_id):
+        return self._restored.get(guild_id, {}).pop(user_id, None)
+
+    def snapshot(self):
+        keys, self._dirty = self._dirty, set()
+        now = monotonic_seconds()
+        timestamp = int_timestamp()
+
+        for key in keys:
+            bucket = self._buckets.get(key)
+
+            if bucket is not None:
+                yield (*key, bucket.remaining_uses, timestamp + bucket.reset_deadline - now)
+
+    def remove(self, guild_id, user_id):
+        bucket = self._buckets.pop((guild_id, user_id), None)
+        self._scheduled.pop((guild_id, user_id), None)
+
+        if bucket is not None:
+            guild_buckets = self._guilds[guild_id]
+            del guild_buckets[user_id]
+
+            if not len(guild_buckets):
+                del self._guilds[guild_id]
+
+        return bucket
+
+    def sweep(self):
+        now = monotonic_seconds()
+
+        while len(self._deadlines) and self._deadlines[0][0] <= now:
+            entry = self._pop_scheduled()
+
+            # a bucket past its deadline is refilled on the next use anyway,
+            # so it can be dropped and made again from the config
+            if entry is not None and entry[0] <= now:
+                self.remove(*entry[1:])
+            elif entry is not None:
+                heapq.heappush(self._deadlines, entry)
+
+    def for_guild(self, guild_id):
+        return tuple(self._guilds.get(guild_id, {}).values())
 
 
 class CooldownCommand(commands.Command):
     
     def __init__(self, *args, **kwargs):
+        max_buckets = kwargs.pop("max_buckets", None)
+
         super().__init__(*args, **kwargs)
-        self.custom_cooldown_buckets = []
+        self.custom_cooldown_buckets = CooldownBuckets(max_buckets)
 
     def current_bucket(self, ctx):
-        return discord.utils.find(
-            lambda x: x.guild == ctx.guild and x.user == ctx.author and x.command == ctx.command,
-            self.custom_cooldown_buckets)
+        return self.custom_cooldown_buckets.get(ctx.guild.id, ctx.author.id)
+
+    def snapshot_rows(self):
+        return [(guild_id, user_id, self.qualified_name, remaining_uses, reset_at)
+            for guild_id, user_id, remaining_uses, reset_at in self.custom_cooldown_buckets.snapshot()]
 
             
 class CustomCooldownBucket:
 
-    def __init__(self, ctx):
-        self.bot = ctx.bot
-        self.user = ctx.author
-        self.guild = ctx.guild
-        self.command = ctx.command
-        self.semaphore = asyncio.Semaphore(1, loop=ctx.bot.loop)
+    __slots__ = ("guild_id", "user_id", "max_uses", "remaining_uses", "reset_seconds", "reset_deadline")
+
+    def __init__(self, guild_id, user_id):
+        self.guild_id = guild_id
+        self.user_id = user_id
         self.max_uses = None
         self.remaining_uses = None
-        self.reset_timedelta = None
-        self.reset_at = None
+        self.reset_seconds = None
+        self.reset_deadline = None
+
+    @property
+    def reset_datetime(self):
+        return datetime.datetime.now() + datetime.timedelta(
+            seconds=max(self.reset_deadline - monotonic_seconds(), 0))
 
     def update(self, *, new_reset_seconds=None, new_max_uses=None):
         if new_max_uses is not None:
@@ -38,65 +215,117 @@ class CustomCooldownBucket:
             self.remaining_uses = self.max_uses
         
         if new_reset_seconds is not None:
-            self.reset_timedelta = datetime.timedelta(seconds=new_reset_seconds)
+            self.reset_seconds = new_reset_seconds
         
-        self.reset_at = datetime.datetime.now() + self.reset_timedelta
+        self.reset_deadline = monotonic_seconds() + self.reset_seconds
 
-    async def init(self):
-        sql = """
-        SELECT `max_uses`, `reset_seconds`
-        FROM `cooldown`
-        WHERE `cooldown`.`server` = ? AND `cooldown`.`command` = ?
-        """
+    def restore(self, remaining_uses, reset_at):
+        self.remaining_uses = min(remaining_uses, self.max_uses)
+        self.reset_deadline = monotonic_seconds() + max(reset_at - int_timestamp(), 0)
 
-        bucket_info = await self.bot.db.execute(sql, 
-            self.guild.id, self.command.qualified_name)
+    def use(self):
+        now = monotonic_seconds()
 
-        if bucket_info is not None:
-            max_uses, reset_seconds = bucket_info
-        else:
-            max_uses, reset_seconds = self.bot.config.default_cooldown
+        if now >= self.reset_deadline:
+            self.remaining_uses = self.max_uses
+            self.reset_deadline = now + self.reset_seconds
 
-        self.update(new_reset_seconds=reset_seconds, new_max_uses=max_uses)
+        if self.remaining_uses > 0:
+            self.remaining_uses -= 1
+            return True
 
-    async def use(self):
-        async with self.semaphore:
-            now = datetime.datetime.now()
+        return False
 
-            result = False
 
-            if now >= self.reset_at:
-                self.remaining_uses = self.max_uses
-                self.reset_at = now + self.reset_timedelta
+def collect_cooldowns(cooldown_commands):
+    rows = []
 
-            if self.remaining_uses > 0:
-                self.remaining_uses -= 1
-                result = True
+    for command in cooldown_commands:
+        if isinstance(command, CooldownCommand):
+            rows.extend(command.snapshot_rows())
 
-            return result
+    return rows
+
+
+async def save_cooldowns(bot, rows, *, chunk_size=500):
+    if len(rows):
+        sql = bot.db.upsert_query("cooldown_state", ("server", "member", "command"),
+            ("server", "member", "command", "remaining_uses", "reset_at"),
+            ("remaining_uses", "reset_at"))
+
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+
+            if await bot.db.executemany(sql, chunk, with_commit=True) is not None:
+                continue
+
+            # the snapshot took the keys, so a failed write marks them again
+            for guild_id, user_id, command_name, _, _ in chunk:
+                command = bot.get_command(command_name)
+
+                if not isinstance(command, CooldownCommand):
+                    continue
+
+                bucket = command.custom_cooldown_buckets.get(guild_id, user_id)
+
+                if bucket is not None:
+                    command.custom_cooldown_buckets.touch(bucket)
+
+    await bot.db.execute("DELETE FROM `cooldown_state` WHERE `cooldown_state`.`reset_at` <= ?",
+        int_timestamp(), with_commit=True)
+
+
+async def restore_cooldowns(bot, command, guild_id):
+    sql = """
+    SELECT `member`, `remaining_uses`, `reset_at`
+    FROM `cooldown_state`
+    WHERE `cooldown_state`.`server` = ? AND `cooldown_state`.`command` = ?
+        AND `cooldown_state`.`reset_at` > ?
+    """
+
+    rows = await bot.db.execute(sql, guild_id, command.qualified_name,
+        int_timestamp(), fetch_all=True)
+
+    command.custom_cooldown_buckets.restore(guild_id, rows or ())
 
 
 def custom_cooldown():
 
     async def predicate(ctx):
         command = ctx.command
+        buckets = command.custom_cooldown_buckets
+        bucket = command.current_bucket(ctx)
+
+        if bucket is None and not buckets.is_restored(ctx.guild.id):
+            # unloaded cogs save their buckets in the background, a command of
+            # the cog being unloaded must not wait for its own save
+            if ctx.bot.get_cog(ctx.cog.qualified_name) is ctx.cog:
+                await ctx.bot.wait_unloaded()
 
-        bucket = discord.utils.find(
-            lambda b: b.guild == ctx.guild and b.user == ctx.author,
-            command.custom_cooldown_buckets)
+            await restore_cooldowns(ctx.bot, command, ctx.guild.id)
+            bucket = command.current_bucket(ctx)
 
         if bucket is None:
-            bucket = CustomCooldownBucket(ctx)
+            max_uses, reset_seconds = ctx.bot.cooldown_config.get(
+                ctx.guild.id, command.qualified_name)
 
-            await bucket.init()
+            bucket = CustomCooldownBucket(ctx.guild.id, ctx.author.id)
+            bucket.update(new_reset_seconds=reset_seconds, new_max_uses=max_uses)
 
-            command.custom_cooldown_buckets.append(bucket)
+            restored = buckets.pop_restored(ctx.guild.id, ctx.author.id)
 
-        if not await bucket.use():
+            if restored is not None:
+                bucket.restore(*restored)
+
+            buckets.add(bucket)
+
+        used = bucket.use()
+        buckets.touch(bucket)
+
+        if not used:
             raise commands.CheckFailure(ctx.lang["errors"]["on_cooldown"].format(
-                bucket.reset_at.strftime(ctx.lang["long_date"])))
+                bucket.reset_datetime.strftime(ctx.lang["long_date"])))
         
         return True
 
     return commands.check(predicate)
-
@@ -1,23 +1,208 @@
 import sqlite3
 import pymysql
 import logging
+import asyncio
 
-from asyncio import Lock
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from collections import deque
+from functools import lru_cache
 from enum import Enum
 from typing import Optional, Collection, Any
 from random import random
-from time import time
+from time import time, monotonic, perf_counter
+
+from .query_stats import QueryStats
 
 
 def int_timestamp() -> int:
     return int(time())
 
 
+@lru_cache(maxsize=512)
+def translate_query(query: str, param_lit: str = '?') -> str:
+    result = []
+    quote = None
+    escaped = False
+
+    for s in query:
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif s == '\\' and quote != '`':
+                escaped = True
+            elif s == quote:
+                quote = None
+        elif s in "`'\"":
+            quote = s
+        elif s == param_lit:
+            s = "%s"
+
+        # pymysql interpolates the whole statement with the % operator
+        if s == '%':
+            s = "%%"
+
+        result.append(s)
+
+    return ''.join(result)
+
+
+# the transaction the current task runs in, statements made inside of it
+# reuse its connection instead of checking out their own
+_transaction = ContextVar("transaction", default=None)
+
+
 class DbType(Enum):
     SQLite  = 0
     MySQL   = 1
 
 
+class PooledConnection:
+
+    __slots__ = ("raw", "last_used", "stale", "dirty_since", "commit_waiters", "in_transaction")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.last_used = monotonic()
+        self.stale = False
+        self.dirty_since = None
+        self.commit_waiters = []
+        self.in_transaction = False
+
+    def cursor(self):
+        return self.raw.cursor()
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+
+class ConnectionPool:
+
+    # CR_SERVER_GONE_ERROR, CR_SERVER_LOST, CR_SERVER_LOST_EXTENDED
+    lost_connection_errors = (2006, 2013, 2055)
+
+    def __init__(self, connect, size=1, *, ping_interval=None):
+        self.size = size
+        self.ping_interval = ping_interval
+        self.connections = tuple(
+            PooledConnection(connect()) for _ in range(size))
+
+        self._idle = deque(self.connections)
+        self._waiters = deque()
+        self._reserved = {}
+
+    async def acquire(self, conn: Optional[PooledConnection] = None) -> PooledConnection:
+        if conn is None:
+            if len(self._idle) > 0:
+                return self._idle.popleft()
+
+            waiters = self._waiters
+        else:
+            if conn in self._idle:
+                self._idle.remove(conn)
+                return conn
+
+            waiters = self._reserved.setdefault(conn, deque())
+
+        waiter = asyncio.get_event_loop().create_future()
+        waiters.append(waiter)
+
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result())
+
+            raise
+
+    def release(self, conn: PooledConnection) -> None:
+        conn.last_used = monotonic()
+
+        # whoever asked for this exact connection goes first
+        for waiters in (self._reserved.get(conn), self._waiters):
+            while waiters:
+                waiter = waiters.popleft()
+
+                if not waiter.done():
+                    waiter.set_result(conn)
+                    return
+
+        self._idle.append(conn)
+
+    def check(self, conn: PooledConnection) -> None:
+        if self.ping_interval is None:
+            return
+
+        if conn.stale or monotonic() - conn.last_used >= self.ping_interval:
+            conn.raw.ping(reconnect=True)
+            conn.stale = False
+
+    def is_disconnect(self, error: Exception) -> bool:
+        return isinstance(error, pymysql.err.OperationalError) and \
+            len(error.args) > 0 and error.args[0] in self.lost_connection_errors
+
+    def close(self) -> None:
+        for conn in self.connections:
+            conn.close()
+
+
+class Transaction:
+
+    def __init__(self, db):
+        self.db = db
+        self.conn = None
+        self.nested = False
+        self._token = None
+
+    async def __aenter__(self):
+        if _transaction.get() is not None:
+            self.nested = True
+            return _transaction.get()
+
+        conn = await self.db.pool.acquire()
+
+        try:
+            # writes waiting for a group commit shouldn't end up in our rollback
+            if conn.commit_waiters:
+                await self.db._commit_pending(conn)
+
+            await self.db._call(self.db._begin, conn)
+        except BaseException:
+            self.db.pool.release(conn)
+            raise
+
+        self.conn = conn
+        self._token = _transaction.set(self)
+
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.nested:
+            return False
+
+        _transaction.reset(self._token)
+
+        try:
+            if exc_type is None:
+                committed = await self.db._call(self.db._commit, self.conn)
+            else:
+                await self.db._call(self.db._rollback, self.conn)
+        finally:
+            self.conn.in_transaction = False
+            self.db.pool.release(self.conn)
+
+        if exc_type is None and not committed:
+            raise Exception("Transaction commit failed")
+
+        return False
+
+
 class DataBase:
     param_lit = '?'
     null = "NULL"
@@ -25,21 +210,74 @@ class DataBase:
     int_min_bound = -999999999999999999
     int_max_bound = 999999999999999999
 
+    sqlite_profiles = {
+        "default": (),
+        "performance": (
+            # readers don't block the writer and a commit only appends to the wal
+            "PRAGMA journal_mode = WAL",
+            "PRAGMA synchronous = NORMAL",
+            "PRAGMA mmap_size = 268435456",
+            "PRAGMA cache_size = -65536",
+            "PRAGMA temp_store = MEMORY"
+        )
+    }
+
     def __init__(self, db_type, **kwargs):
+        threaded = kwargs.pop("threaded", True)
+
+        # group commit: writes are committed together once the oldest one
+        # waited commit_window seconds or commit_batch writes are pending
+        self.commit_window = kwargs.pop("commit_window", 0)
+        self.commit_batch = kwargs.pop("commit_batch", 64)
+        self._flush_handle = None
+
+        # seconds a statement may take before it is written to the slow query log
+        slow_query = kwargs.pop("slow_query", 0.25)
+
+        if kwargs.pop("query_stats", True):
+            self.stats = QueryStats(slow_threshold=slow_query)
+        else:
+            self.stats = None
+
         if db_type is DbType.SQLite:
             database = kwargs.pop("database")
-            check_same = kwargs.pop("check_same_thread", True)
-            self.conn = sqlite3.connect(database, check_same_thread=check_same)
+            check_same = kwargs.pop("check_same_thread", not threaded)
+            profile = kwargs.pop("profile", "default")
+
+            if profile not in self.sqlite_profiles:
+                raise Exception(f"Unknown SQLite profile {profile}")
+
+            self.sqlite_pragmas = self.sqlite_profiles[profile]
+
+            self.pool = ConnectionPool(
+                lambda: sqlite3.connect(database, check_same_thread=check_same))
         elif db_type is DbType.MySQL:
-            self.conn = pymysql.connect(**kwargs)
+            pool_size = kwargs.pop("pool_size", 4)
+            ping_interval = kwargs.pop("ping_interval", 60)
+
+            # a connection that only served reads would otherwise keep its
+            # repeatable read snapshot and miss the other connections' commits,
+            # writes open their transaction explicitly in _execute
+            kwargs["autocommit"] = True
+
+            self.pool = ConnectionPool(
+                lambda: pymysql.connect(**kwargs),
+                pool_size, ping_interval=ping_interval)
         else:
             raise Exception("Unsupported DbType")
 
         self.db_type = db_type
-        self.cursor = self.conn.cursor()
 
-        self._lock = Lock()
-        self._adapt()
+        # a connection is only ever driven by one worker at a time, so the
+        # workers never outnumber the pooled connections
+        if threaded:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.pool.size, thread_name_prefix="warden-db")
+        else:
+            self._executor = None
+
+        for conn in self.pool.connections:
+            self._adapt(conn)
 
     def _make_safe_value(self, number):
         return max(min(number, self.int_max_bound), self.int_min_bound)
@@ -55,75 +293,373 @@ class DataBase:
 
         return result
 
-    def _adapt(self) -> None:
+    def _adapt(self, conn) -> None:
         if self.db_type is DbType.SQLite:
-            self.conn.create_function("rand", 0, random)
-            self.conn.create_function("unix_timestamp", 0, int_timestamp)
+            conn.raw.create_function("rand", 0, random)
+            conn.raw.create_function("unix_timestamp", 0, int_timestamp)
+
+            for pragma in self.sqlite_pragmas:
+                conn.raw.execute(pragma)
 
     def _wrap_args(self, seq):
         for row in seq:
             yield (row, )
 
-    async def commit(self) -> None:
-        async with self._lock:
-            return self.conn.commit()
+    def _submit(self, func, conn, *args) -> asyncio.Future:
+        loop = asyncio.get_event_loop()
 
-    async def execute(self, query: str, *args, **kwargs):
-        if self.db_type is DbType.MySQL:
-            query = self.prepare_query(query)
+        if self._executor is not None:
+            return loop.run_in_executor(self._executor, func, conn, *args)
+
+        future = loop.create_future()
 
         try:
-            self.cursor.execute(query, self._make_safe_ints(args))
+            future.set_result(func(conn, *args))
         except Exception as e:
-            logging.error(f"{str(e)} ({query}) ({args})")
+            future.set_exception(e)
+
+        return future
+
+    async def _wait(self, future):
+        cancelled = False
+
+        # the worker keeps driving the connection after a cancel, so the
+        # caller may only release it once the job is over
+        while not future.done():
+            try:
+                await asyncio.wait((future, ))
+            except asyncio.CancelledError:
+                cancelled = True
+
+        if cancelled:
+            raise asyncio.CancelledError()
+
+        return future.result()
+
+    async def _call(self, func, conn, *args):
+        return await self._wait(self._submit(func, conn, *args))
+
+    async def _run(self, func, *args):
+        transaction = _transaction.get()
+
+        if transaction is not None:
+            return await self._call(func, transaction.conn, *args)
+
+        conn = await self.pool.acquire()
+        waiter = None
+
+        try:
+            try:
+                result = await self._call(func, conn, *args)
+            except asyncio.CancelledError:
+                # a cancelled write still goes out with the next group commit
+                if conn.dirty_since is not None:
+                    conn.commit_waiters.append(asyncio.get_event_loop().create_future())
+                    self._schedule_flush()
+
+                raise
+
+            if conn.stale and conn.commit_waiters:
+                # the pending writes went away with the lost connection
+                self._fail_pending(conn)
+
+            if conn.dirty_since is not None:
+                waiter = asyncio.get_event_loop().create_future()
+                conn.commit_waiters.append(waiter)
+
+                if len(conn.commit_waiters) >= self.commit_batch or \
+                        monotonic() - conn.dirty_since >= self.commit_window:
+                    await self._commit_pending(conn)
+                else:
+                    self._schedule_flush()
+        finally:
+            self.pool.release(conn)
+
+        if waiter is not None and not await waiter:
+            return None
+
+        return result
+
+    def _commit(self, conn):
+        try:
+            conn.commit()
+
+            return True
+        except Exception as e:
+            if self.pool.is_disconnect(e):
+                conn.stale = True
+
+            logging.error(f"{str(e)} (COMMIT)")
+
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+
+            return False
+
+    def _begin(self, conn):
+        self.pool.check(conn)
+
+        if self.db_type is DbType.SQLite:
+            if not conn.raw.in_transaction:
+                conn.raw.execute("BEGIN")
+        else:
+            conn.raw.begin()
+
+        conn.in_transaction = True
+
+    def _rollback(self, conn):
+        try:
+            conn.rollback()
+        except Exception as e:
+            if self.pool.is_disconnect(e):
+                conn.stale = True
+
+            logging.error(f"{str(e)} (ROLLBACK)")
+
+    def _fail_pending(self, conn) -> None:
+        waiters, conn.commit_waiters = conn.commit_waiters, []
+        conn.dirty_since = None
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(False)
+
+    async def _commit_pending(self, conn) -> None:
+        waiters, conn.commit_waiters = conn.commit_waiters, []
+        conn.dirty_since = None
+
+        def resolve(future):
+            committed = not future.cancelled() and future.exception() is None and future.result()
+
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(committed)
+
+        # the writers are answered even if the task driving the commit is cancelled
+        future = self._submit(self._commit, conn)
+        future.add_done_callback(resolve)
+
+        await self._wait(future)
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is not None:
             return
 
-        return await self.fetch(**kwargs)
+        loop = asyncio.get_event_loop()
 
-    async def executemany(self, query: str, args, **kwargs):
-        if self.db_type is DbType.MySQL:
-            query = self.prepare_query(query)
+        self._flush_handle = loop.call_later(
+            self.commit_window, lambda: loop.create_task(self.flush()))
 
-        if kwargs.pop("wrap_args", False):
-            args = self._wrap_args(args)
+    async def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        for conn in self.pool.connections:
+            if not conn.commit_waiters:
+                continue
+
+            await self.pool.acquire(conn)
+
+            try:
+                if conn.commit_waiters:
+                    await self._commit_pending(conn)
+            finally:
+                self.pool.release(conn)
+
+    def _execute(self, conn, query, args, kwargs, many=False):
+        cursor = None
+        began = False
 
         try:
-            self.cursor.executemany(query, args)
+            self.pool.check(conn)
+
+            # executemany and group commits need a transaction around the writes
+            if self.db_type is DbType.MySQL and kwargs.get("with_commit") and \
+                    not conn.in_transaction and conn.dirty_since is None:
+                conn.raw.begin()
+                began = True
+
+            cursor = conn.cursor()
+            started = perf_counter()
+
+            if many:
+                cursor.executemany(query, args)
+            else:
+                cursor.execute(query, args)
+
+            result = self._fetch(conn, cursor, **kwargs)
+
+            if self.stats is not None:
+                self.stats.record(
+                    query, perf_counter() - started,
+                    self._count_rows(result, **kwargs), None if many else args)
+
+            return result
         except Exception as e:
+            if self.pool.is_disconnect(e):
+                conn.stale = True
+
             logging.error(f"{str(e)} ({query}) ({args})")
-            return
 
-        return await self.fetch(**kwargs)
+            # a half done transaction must not be committed
+            if conn.in_transaction:
+                raise
+
+            if began:
+                self._rollback(conn)
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def _count_rows(self, result, *, fetch_all=False, with_commit=False):
+        if with_commit:
+            return max(result, 0)
+
+        if fetch_all:
+            return len(result)
+
+        return 0 if result is None else 1
 
-    async def fetch(self, *, fetch_all=False, with_commit=False):
+    def _fetch(self, conn, cursor, *, fetch_all=False, with_commit=False):
         if with_commit:
-            count = self.cursor.rowcount
+            count = cursor.rowcount
 
-            if count:
-                await self.commit()
+            if not conn.in_transaction:
+                if count and self.commit_window > 0:
+                    if conn.dirty_since is None:
+                        conn.dirty_since = monotonic()
+                elif conn.dirty_since is None:
+                    # also ends the transaction of a write that matched nothing
+                    conn.commit()
 
             return count
 
         if fetch_all:
-            return self.cursor.fetchall()
+            return cursor.fetchall()
 
-        fetched = self.cursor.fetchone()
+        fetched = cursor.fetchone()
 
         return fetched[0] if fetched is not None and len(fetched) == 1 \
             else fetched
 
-    def prepare_query(self, query: str) -> str:
-        result = []
+    async def execute(self, query: str, *args, **kwargs):
+        if self.db_type is DbType.MySQL:
+            query = self.prepare_query(query)
+
+        return await self._run(
+            self._execute, query, self._make_safe_ints(args), kwargs)
+
+    async def executemany(self, query: str, args, **kwargs):
+        if self.db_type is DbType.MySQL:
+            query = self.prepare_query(query)
 
-        in_param = False
+        if kwargs.pop("wrap_args", False):
+            args = self._wrap_args(args)
+
+        args = [self._make_safe_ints(row) for row in args]
+
+        return await self._run(self._execute, query, args, kwargs, True)
+
+    async def fetch(self, query: str, *args, fetch_all=False, with_commit=False):
+        # statements no longer share a cursor, so the query comes along
+        return await self.execute(query, *args, fetch_all=fetch_all, with_commit=with_commit)
+
+    async def commit(self) -> None:
+        # writes commit on their own, this only pushes out pending group commits
+        await self.flush()
+
+    def transaction(self) -> Transaction:
+        return Transaction(self)
+
+    def upsert_query(self, table: str, key_columns: Collection[str],
+                     columns: Collection[str], update_columns: Collection[str]) -> str:
+        sql = "INSERT INTO `{}` ({}) VALUES ({})".format(
+            table,
+            ', '.join(f"`{column}`" for column in columns),
+            ', '.join(self.param_lit for _ in columns))
+
+        if self.db_type is DbType.SQLite:
+            if len(update_columns):
+                return "{} ON CONFLICT ({}) DO UPDATE SET {}".format(
+                    sql,
+                    ', '.join(f"`{column}`" for column in key_columns),
+                    ', '.join(f"`{column}` = excluded.`{column}`" for column in update_columns))
 
-        for s in query:
-            if s in "`'\"":
-                in_param = not in_param
+            return f"{sql} ON CONFLICT DO NOTHING"
 
-            if not in_param and s == self.param_lit:
-                s = r"%s"
+        if len(update_columns):
+            return "{} ON DUPLICATE KEY UPDATE {}".format(
+                sql, ', '.join(f"`{column}` = VALUES(`{column}`)" for column in update_columns))
 
-            result.append(s)
+        return sql.replace("INSERT", "INSERT IGNORE", 1)
+
+    async def upsert(self, table: str, key_columns: Collection[str], values: dict, *,
+                     update_columns: Optional[Collection[str]] = None):
+        columns = tuple(values.keys())
+
+        if update_columns is None:
+            update_columns = tuple(c for c in columns if c not in key_columns)
+
+        return await self.execute(
+            self.upsert_query(table, key_columns, columns, update_columns),
+            *values.values(), with_commit=True)
+
+    def _migrate(self, conn, migrations):
+        insert_sql = "INSERT INTO `schema_version` VALUES (?, ?)"
+
+        if self.db_type is DbType.MySQL:
+            insert_sql = self.prepare_query(insert_sql)
+
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS `schema_version` "
+                "(`version` int NOT NULL, `applied` int NOT NULL)")
+            cursor.execute("SELECT MAX(`version`) FROM `schema_version`")
+
+            current = cursor.fetchone()[0] or 0
+
+            for migration in sorted(migrations, key=lambda m: m.version):
+                if migration.version <= current:
+                    continue
+
+                for statement in migration.statements(self.db_type):
+                    try:
+                        cursor.execute(statement)
+                    except Exception as e:
+                        # ER_DUP_KEYNAME, left by a half applied mysql migration
+                        if not (self.db_type is DbType.MySQL and e.args[:1] == (1061, )):
+                            logging.error(f"Migration {migration.version} failed: {str(e)} ({statement})")
+                            raise
+
+                cursor.execute(insert_sql, (migration.version, int_timestamp()))
+                conn.commit()
+
+                current = migration.version
+
+                logging.info(f"Applied migration {current} - {migration.description}")
+
+            return current
+        finally:
+            cursor.close()
+
+    async def migrate(self, migrations) -> int:
+        return await self._run(self._migrate, migrations)
+
+    async def close(self) -> None:
+        await self.flush()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+        self.pool.close()
+
+    def prepare_query(self, query: str) -> str:
+        return translate_query(query, self.param_lit)
 
-        return ''.join(result)
+    def query_cache_info(self):
+        return translate_query.cache_info()
@@ -7,10 +7,11 @@ def set_disabled(command):
 
 
 async def set_disable_state(ctx, command, state):
-    return await ctx.bot.db.execute(
-        "INSERT INTO `disable` VALUES (?, ?, ?)",
-        ctx.guild.id, command.qualified_name, state,
-        with_commit=True)
+    return await ctx.bot.db.upsert("disable", ("server", "command"), {
+        "server": ctx.guild.id,
+        "command": command.qualified_name,
+        "disabled": state
+    })
 
 
 def disabled_command():
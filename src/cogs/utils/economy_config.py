@@ -0,0 +1,106 @@
+from time import perf_counter
+
+from .loading import SharedLoads
+
+
+class GuildEconomyConfig:
+
+    __slots__ = ("start_money", "game_configs")
+
+    def __init__(self):
+        # (cash, bank) or None when the guild has no start money row
+        self.start_money = None
+        # command name -> (chance, reward)
+        self.game_configs = {}
+
+
+class EconomyConfigCache:
+
+    def __init__(self, db, default_game_config):
+        self.db = db
+        self.default_game_config = tuple(default_game_config)
+        self._configs = {}
+        self._loading = SharedLoads()
+        self._invalidated = None
+
+    def __len__(self):
+        return len(self._configs)
+
+    async def get(self, guild) -> GuildEconomyConfig:
+        guild_id = getattr(guild, "id", guild)
+        config = self._configs.get(guild_id)
+
+        if config is not None:
+            return config
+
+        return await self._loading.run(guild_id, self._load, guild_id)
+
+    async def _load(self, guild_id) -> GuildEconomyConfig:
+        config = GuildEconomyConfig()
+        config.start_money = await self.db.execute(
+            "SELECT `cash`, `bank` FROM `start_money` WHERE `start_money`.`server` = ?",
+            guild_id)
+
+        rows = await self.db.execute(
+            "SELECT `command`, `chance`, `reward` FROM `game_config` WHERE `game_config`.`server` = ?",
+            guild_id, fetch_all=True)
+
+        for command_name, chance, reward in rows or ():
+            config.game_configs[command_name] = (chance, reward)
+
+        # don't keep a config that was changed while it was being read
+        if self._loading.is_current(guild_id):
+            self._configs[guild_id] = config
+
+        return config
+
+    async def preload(self, guild_ids) -> dict:
+        loaded = {guild_id: GuildEconomyConfig() for guild_id in guild_ids}
+        timings = {}
+
+        self._invalidated = set()
+
+        started = perf_counter()
+        rows = await self.db.execute(
+            "SELECT `server`, `cash`, `bank` FROM `start_money`", fetch_all=True)
+
+        for guild_id, cash, bank in rows or ():
+            if guild_id in loaded:
+                loaded[guild_id].start_money = (cash, bank)
+
+        timings["start_money"] = perf_counter() - started
+
+        started = perf_counter()
+        rows = await self.db.execute(
+            "SELECT `server`, `command`, `chance`, `reward` FROM `game_config`", fetch_all=True)
+
+        for guild_id, command_name, chance, reward in rows or ():
+            if guild_id in loaded:
+                loaded[guild_id].game_configs[command_name] = (chance, reward)
+
+        timings["game_config"] = perf_counter() - started
+
+        for guild_id, config in loaded.items():
+            if guild_id not in self._invalidated and guild_id not in self._loading:
+                self._configs.setdefault(guild_id, config)
+
+        self._invalidated = None
+
+        return timings
+
+    async def game_config(self, guild, command_name) -> tuple:
+        config = await self.get(guild)
+
+        return config.game_configs.get(command_name, self.default_game_config)
+
+    async def start_money(self, guild) -> tuple:
+        return (await self.get(guild)).start_money
+
+    def invalidate(self, guild) -> None:
+        guild_id = getattr(guild, "id", guild)
+
+        self._configs.pop(guild_id, None)
+        self._loading.discard(guild_id)
+
+        if self._invalidated is not None:
+            self._invalidated.add(guild_id)
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+
+from time import perf_counter
+
+from .loading import SharedLoads
+
+# drift reports, __main__ sets its level
+totals_log = logging.getLogger("warden.economy_totals")
+
+
+class GuildTotals:
+
+    __slots__ = ("cash", "bank", "count")
+
+    def __init__(self, cash=0, bank=0, count=0):
+        self.cash = cash
+        self.bank = bank
+        self.count = count
+
+    def __eq__(self, other):
+        return (self.cash, self.bank, self.count) == (other.cash, other.bank, other.count)
+
+    @property
+    def sum(self):
+        return self.cash + self.bank
+
+    def apply(self, cash, bank, count):
+        self.cash += cash
+        self.bank += bank
+        self.count += count
+
+
+class EconomyTotals:
+
+    def __init__(self, db, *, overlay=None, lock=None):
+        self.db = db
+        # guild id -> (cash, bank, count) deltas not written to the money table yet
+        self.overlay = overlay
+        # held while the table is read, so no write-behind flush lands in between
+        self.lock = lock or asyncio.Lock()
+        self._guilds = {}
+        self._loading = SharedLoads()
+
+    async def get(self, guild_id) -> GuildTotals:
+        totals = self._guilds.get(guild_id)
+
+        if totals is not None:
+            return totals
+
+        return await self._loading.run(guild_id, self._load, guild_id)
+
+    async def _load(self, guild_id) -> GuildTotals:
+        sql = """
+        SELECT SUM(`cash`), SUM(`bank`), COUNT(*)
+        FROM `money`
+        WHERE `money`.`server` = ?
+        """
+
+        async with self.lock:
+            row = await self.db.execute(sql, guild_id)
+            totals = self._guilds[guild_id] = self._make(guild_id, row)
+
+        return totals
+
+    def _make(self, guild_id, row) -> GuildTotals:
+        cash, bank, count = row or (0, 0, 0)
+        totals = GuildTotals(int(cash or 0), int(bank or 0), count or 0)
+
+        if self.overlay is not None:
+            for delta in self.overlay(guild_id):
+                totals.apply(*delta)
+
+        return totals
+
+    async def reconcile(self) -> dict:
+        sql = """
+        SELECT `server`, SUM(`cash`), SUM(`bank`), COUNT(*)
+        FROM `money`
+        GROUP BY `server`
+        """
+
+        started = perf_counter()
+
+        async with self.lock:
+            rows = await self.db.execute(sql, fetch_all=True)
+
+            if rows is None:
+                return {"money_totals": perf_counter() - started}
+
+            rows = {guild_id: values for guild_id, *values in rows}
+            drifted = 0
+
+            for guild_id in set(rows) | set(self._guilds):
+                totals = self._make(guild_id, rows.get(guild_id))
+                old = self._guilds.get(guild_id)
+
+                if old is not None and old != totals:
+                    drifted += 1
+
+                self._guilds[guild_id] = totals
+
+        if drifted:
+            totals_log.warning(f"Economy totals of {drifted} guilds drifted from the money table")
+
+        return {"money_totals": perf_counter() - started}
+
+    def update(self, guild_id, old, new):
+        totals = self._guilds.get(guild_id)
+
+        # not loaded guilds read the table with the overlay once they are needed
+        if totals is None:
+            return
+
+        old_cash, old_bank = old or (0, 0)
+        new_cash, new_bank = new or (0, 0)
+
+        totals.apply(new_cash - old_cash, new_bank - old_bank, (new is not None) - (old is not None))
+
+    def drop(self, guild_id):
+        self._guilds[guild_id] = GuildTotals()
+
+    def invalidate(self, guild_id):
+        self._guilds.pop(guild_id, None)
@@ -0,0 +1,112 @@
+from time import perf_counter
+
+from .loading import SharedLoads
+
+
+class GuildSettings:
+
+    # table -> (column, attribute)
+    tables = {
+        "langs": ("lang", "lang"),
+        "colors": ("color", "color"),
+        "currency": ("symbol", "currency"),
+        "commanders": ("role", "commander"),
+        "moderators": ("role", "moderator"),
+        "log": ("channel", "log"),
+        "autorole": ("role", "autorole"),
+        "welcome": ("content", "welcome"),
+        "mute_roles": ("role", "mute_role"),
+        "rm_enabled": ("enabled", "rm_enabled")
+    }
+
+    __slots__ = tuple(attr for _, attr in tables.values())
+
+    def __init__(self, *values):
+        for (_, attr), value in zip(self.tables.values(), values):
+            setattr(self, attr, value)
+
+        for _, attr in tuple(self.tables.values())[len(values):]:
+            setattr(self, attr, None)
+
+
+class GuildSettingsCache:
+
+    def __init__(self, db):
+        self.db = db
+        self.hits = 0
+        self.misses = 0
+        self._settings = {}
+        self._loading = SharedLoads()
+        self._invalidated = None
+
+        self._select_sql = "SELECT {}".format(', '.join(
+            f"(SELECT `{column}` FROM `{table}` WHERE `{table}`.`server` = ?)"
+            for table, (column, _) in GuildSettings.tables.items()))
+
+    def __len__(self):
+        return len(self._settings)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+
+        return self.hits / total if total else 0.0
+
+    async def get(self, guild) -> GuildSettings:
+        guild_id = getattr(guild, "id", guild)
+        settings = self._settings.get(guild_id)
+
+        if settings is not None:
+            self.hits += 1
+            return settings
+
+        self.misses += 1
+
+        # concurrent misses for the same guild share one query
+        return await self._loading.run(guild_id, self._load, guild_id)
+
+    async def _load(self, guild_id) -> GuildSettings:
+        row = await self.db.execute(
+            self._select_sql, *(guild_id for _ in GuildSettings.tables))
+
+        settings = GuildSettings(*(row or ()))
+
+        # don't keep a row that was invalidated while it was being read
+        if self._loading.is_current(guild_id):
+            self._settings[guild_id] = settings
+
+        return settings
+
+    async def preload(self, guild_ids) -> dict:
+        loaded = {guild_id: GuildSettings() for guild_id in guild_ids}
+        timings = {}
+
+        self._invalidated = set()
+
+        for table, (column, attr) in GuildSettings.tables.items():
+            started = perf_counter()
+            rows = await self.db.execute(
+                f"SELECT `server`, `{column}` FROM `{table}`", fetch_all=True)
+
+            for guild_id, value in rows or ():
+                if guild_id in loaded:
+                    setattr(loaded[guild_id], attr, value)
+
+            timings[table] = perf_counter() - started
+
+        for guild_id, settings in loaded.items():
+            if guild_id not in self._invalidated and guild_id not in self._loading:
+                self._settings.setdefault(guild_id, settings)
+
+        self._invalidated = None
+
+        return timings
+
+    def invalidate(self, guild) -> None:
+        guild_id = getattr(guild, "id", guild)
+
+        self._settings.pop(guild_id, None)
+        self._loading.discard(guild_id)
+
+        if self._invalidated is not None:
+            self._invalidated.add(guild_id)
@@ -0,0 +1,174 @@
+import asyncio
+
+from bisect import bisect_left, insort
+from time import perf_counter, monotonic
+
+from .loading import SharedLoads
+
+
+class GuildRanking:
+
+    __slots__ = ("_sums", "_keys")
+
+    def __init__(self, rows=()):
+        # member id -> money sum, only accounts with a positive sum are ranked
+        self._sums = {member_id: money_sum for member_id, money_sum in rows if money_sum > 0}
+        # (-money sum, member id) kept sorted, so the richest member is first
+        self._keys = sorted((-money_sum, member_id) for member_id, money_sum in self._sums.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, member_id, money_sum):
+        old_sum = self._sums.get(member_id)
+
+        if old_sum == money_sum:
+            return
+
+        if old_sum is not None:
+            del self._keys[bisect_left(self._keys, (-old_sum, member_id))]
+            del self._sums[member_id]
+
+        if money_sum > 0:
+            self._sums[member_id] = money_sum
+            insort(self._keys, (-money_sum, member_id))
+
+    def remove(self, member_id):
+        self.update(member_id, 0)
+
+    def freeze(self):
+        return tuple(self._keys)
+
+    def place(self, member_id):
+        money_sum = self._sums.get(member_id)
+
+        if money_sum is None:
+            return None
+
+        return bisect_left(self._keys, (-money_sum, member_id)) + 1
+
+
+class RankingSnapshot:
+
+    __slots__ = ("keys", "created")
+
+    def __init__(self, ranking):
+        self.keys = ranking.freeze()
+        self.created = monotonic()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def page(self, index, per_page):
+        start = index * per_page
+
+        return [(start + i + 1, member_id, -negative_sum)
+            for i, (negative_sum, member_id) in enumerate(self.keys[start:start + per_page])]
+
+
+class Leaderboard:
+
+    snapshot_ttl = 10
+
+    def __init__(self, db, *, overlay=None, lock=None):
+        self.db = db
+        # guild id -> (member id, money sum) pairs newer than the money table
+        self.overlay = overlay
+        # held while the table is read, so no write-behind flush lands in between
+        self.lock = lock or asyncio.Lock()
+        self._snapshots = {}
+        self._guilds = {}
+        self._loading = SharedLoads()
+        # guild id -> {member id: money sum} saved while the guild was being read
+        self._pending = {}
+
+    async def get(self, guild_id) -> GuildRanking:
+        ranking = self._guilds.get(guild_id)
+
+        if ranking is not None:
+            return ranking
+
+        return await self._loading.run(guild_id, self._load, guild_id)
+
+    async def _load(self, guild_id) -> GuildRanking:
+        sql = """
+        SELECT `member`, `money`.`cash` + `money`.`bank`
+        FROM `money`
+        WHERE `money`.`server` = ? AND `money`.`cash` + `money`.`bank` > 0
+        """
+
+        try:
+            async with self.lock:
+                rows = await self.db.execute(sql, guild_id, fetch_all=True)
+
+                ranking = self._guilds[guild_id] = GuildRanking(rows or ())
+
+                if self.overlay is not None:
+                    for member_id, money_sum in self.overlay(guild_id):
+                        ranking.update(member_id, money_sum)
+
+            for member_id, money_sum in self._pending.pop(guild_id, {}).items():
+                ranking.update(member_id, money_sum)
+
+            return ranking
+        finally:
+            self._pending.pop(guild_id, None)
+
+    async def snapshot(self, guild_id) -> RankingSnapshot:
+        snapshot = self._snapshots.get(guild_id)
+
+        if snapshot is not None and monotonic() - snapshot.created < self.snapshot_ttl:
+            return snapshot
+
+        ranking = await self.get(guild_id)
+        now = monotonic()
+
+        # viewers within the ttl page through the same ranked list
+        self._snapshots = {
+            key: value for key, value in self._snapshots.items()
+            if now - value.created < self.snapshot_ttl}
+        snapshot = self._snapshots[guild_id] = RankingSnapshot(ranking)
+
+        return snapshot
+
+    async def rebuild(self) -> dict:
+        started = perf_counter()
+
+        async with self.lock:
+            rows = await self.db.execute(
+                "SELECT `server`, `member`, `cash` + `bank` FROM `money` WHERE `cash` + `bank` > 0",
+                fetch_all=True)
+
+            guilds = {}
+
+            for guild_id, member_id, money_sum in rows or ():
+                guilds.setdefault(guild_id, []).append((member_id, money_sum))
+
+            self._guilds = {guild_id: GuildRanking(members) for guild_id, members in guilds.items()}
+
+            if self.overlay is not None:
+                for guild_id, ranking in self._guilds.items():
+                    for member_id, money_sum in self.overlay(guild_id):
+                        ranking.update(member_id, money_sum)
+
+        return {"money": perf_counter() - started}
+
+    def update(self, guild_id, member_id, money_sum):
+        ranking = self._guilds.get(guild_id)
+
+        # not loaded guilds read the saved row once they are needed
+        if ranking is not None:
+            ranking.update(member_id, money_sum)
+        elif guild_id in self._loading:
+            self._pending.setdefault(guild_id, {})[member_id] = money_sum
+
+    def remove(self, guild_id, member_id):
+        self.update(guild_id, member_id, 0)
+
+    def drop(self, guild_id):
+        self._guilds[guild_id] = GuildRanking()
+        self._snapshots.pop(guild_id, None)
+
+    def invalidate(self, guild_id):
+        self._guilds.pop(guild_id, None)
+        self._snapshots.pop(guild_id, None)
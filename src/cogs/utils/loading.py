@@ -0,0 +1,41 @@
+import asyncio
+import contextvars
+
+
+class SharedLoads:
+
+    def __init__(self):
+        # key -> task reading the key, concurrent misses await the same one
+        self._tasks = {}
+
+    def __contains__(self, key):
+        return key in self._tasks
+
+    def __iter__(self):
+        return iter(tuple(self._tasks))
+
+    def get(self, key):
+        return self._tasks.get(key)
+
+    async def run(self, key, load, *args):
+        task = self._tasks.get(key)
+
+        if task is None:
+            # an empty context, a load started inside db.transaction() must
+            # not run its reads on the caller's transaction
+            task = self._tasks[key] = contextvars.Context().run(
+                asyncio.ensure_future, load(*args))
+            task.add_done_callback(lambda done: self._release(key, done))
+
+        return await asyncio.shield(task)
+
+    def _release(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def is_current(self, key) -> bool:
+        # false once the key was discarded while the load ran
+        return self._tasks.get(key) is asyncio.current_task()
+
+    def discard(self, key):
+        self._tasks.pop(key, None)
@@ -0,0 +1,151 @@
+import re
+
+from .db import DbType
+
+
+class Migration:
+
+    def __init__(self, version: int, description: str, *steps):
+        self.version = version
+        self.description = description
+        self.steps = steps
+
+    def statements(self, db_type: DbType):
+        for step in self.steps:
+            yield from step(db_type)
+
+
+def _sqlite_columns(columns):
+    # sqlite has no index prefix lengths: `name`(100) -> `name`
+    return re.sub(r"(`\w+`)\(\d+\)", r"\1", columns)
+
+
+def create_table(table: str, *columns):
+
+    def step(db_type):
+        sql = f"CREATE TABLE IF NOT EXISTS `{table}` ({', '.join(columns)})"
+
+        if db_type is DbType.MySQL:
+            sql += " ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+
+        yield sql
+
+    return step
+
+
+def add_index(table: str, name: str, columns: str, *, unique=False):
+    index = "UNIQUE INDEX" if unique else "INDEX"
+
+    def step(db_type):
+        if db_type is DbType.SQLite:
+            if unique:
+                yield (f"DELETE FROM `{table}` WHERE `rowid` NOT IN "
+                    f"(SELECT MIN(`rowid`) FROM `{table}` GROUP BY {_sqlite_columns(columns)})")
+
+            yield (f"CREATE {index} IF NOT EXISTS `{name}` "
+                f"ON `{table}` ({_sqlite_columns(columns)})")
+        elif unique:
+            # mysql can't drop duplicated rows in place without a row id,
+            # so the table is copied over a keyed twin with INSERT IGNORE
+            yield f"DROP TABLE IF EXISTS `{table}_dedup`, `{table}_old`"
+            yield f"CREATE TABLE `{table}_dedup` LIKE `{table}`"
+            yield f"ALTER TABLE `{table}_dedup` ADD {index} `{name}` ({columns})"
+            yield f"INSERT IGNORE INTO `{table}_dedup` SELECT * FROM `{table}`"
+            yield f"RENAME TABLE `{table}` TO `{table}_old`, `{table}_dedup` TO `{table}`"
+            yield f"DROP TABLE `{table}_old`"
+        else:
+            yield f"CREATE {index} `{name}` ON `{table}` ({columns})"
+
+    return step
+
+
+GUILD_SETTINGS_TABLES = (
+    "autorole", "colors", "commanders", "currency", "langs", "log",
+    "moderators", "mute_roles", "rm_enabled", "start_money",
+    "twitch_channels", "twitch_webhooks", "welcome"
+)
+
+
+MIGRATIONS = (
+    Migration(
+        1, "baseline tables",
+        create_table("autorole", "`server` bigint", "`role` bigint"),
+        create_table("cases",
+            "`id` int", "`server` bigint", "`author` bigint", "`member` bigint",
+            "`type` varchar(10)", "`expires` int", "`reason` text", "`removed` tinyint(1)"),
+        create_table("color_roles", "`server` bigint", "`member` bigint", "`role` bigint"),
+        create_table("colors", "`server` bigint", "`color` varchar(11)"),
+        create_table("commanders", "`server` bigint", "`role` bigint"),
+        create_table("cooldown",
+            "`server` bigint", "`command` text", "`max_uses` bigint", "`reset_seconds` bigint"),
+        create_table("currency", "`server` bigint", "`symbol` bigint"),
+        create_table("disable", "`server` bigint", "`command` text", "`disabled` tinyint(1)"),
+        create_table("emoji_roles",
+            "`guild_id` bigint", "`message_id` bigint", "`role_id` bigint", "`emoji_id` text"),
+        create_table("game_config",
+            "`server` bigint", "`command` text", "`chance` int", "`reward` bigint"),
+        create_table("income",
+            "`server` bigint", "`member` bigint", "`amount` bigint",
+            "`is_percentage` tinyint(1)", "`interval` bigint", "`seen` int"),
+        create_table("langs", "`server` bigint", "`lang` varchar(2)"),
+        create_table("log", "`server` bigint", "`channel` bigint"),
+        create_table("moderators", "`server` bigint", "`role` bigint"),
+        create_table("money", "`server` bigint", "`member` bigint", "`cash` bigint", "`bank` bigint"),
+        create_table("mute_roles", "`server` bigint", "`role` bigint"),
+        create_table("ranks", "`server` bigint", "`role` bigint"),
+        create_table("rm_buffer", "`server` bigint", "`member` bigint", "`role` bigint"),
+        create_table("rm_enabled", "`server` bigint", "`enabled` tinyint(1)"),
+        create_table("rm_ignore", "`server` bigint", "`model` bigint", "`is_role` tinyint(1)"),
+        create_table("shop_items",
+            "`server` bigint", "`author` bigint", "`buy_count` bigint", "`name` text",
+            "`price` bigint", "`description` text", "`role` bigint", "`stock` bigint",
+            "`message_type` int", "`message` text"),
+        create_table("start_money", "`server` bigint", "`cash` bigint", "`bank` bigint"),
+        create_table("story",
+            "`id` bigint", "`server` bigint", "`author` bigint", "`type` text",
+            "`result_type` int", "`text` text", "`lang` varchar(10)"),
+        create_table("tags",
+            "`member` bigint", "`name` text", "`content` text", "`used` bigint", "`created` int"),
+        create_table("twitch", "`server` bigint", "`user_id` bigint"),
+        create_table("twitch_channels", "`server` bigint", "`channel` bigint"),
+        create_table("twitch_webhooks", "`server` bigint", "`id` text", "`token` text"),
+        create_table("welcome", "`server` bigint", "`content` text")
+    ),
+    Migration(
+        2, "keys and indexes",
+        *(add_index(table, f"{table}_server", "`server`", unique=True)
+            for table in GUILD_SETTINGS_TABLES),
+        add_index("money", "money_member", "`server`, `member`", unique=True),
+        add_index("money", "money_sum", "`server`, (`cash` + `bank`)"),
+        add_index("income", "income_member", "`server`, `member`", unique=True),
+        add_index("cooldown", "cooldown_command", "`server`, `command`(100)", unique=True),
+        add_index("game_config", "game_config_command", "`server`, `command`(100)", unique=True),
+        add_index("disable", "disable_command", "`server`, `command`(100)", unique=True),
+        add_index("color_roles", "color_roles_member", "`server`, `member`", unique=True),
+        add_index("emoji_roles", "emoji_roles_emoji",
+            "`guild_id`, `message_id`, `emoji_id`(100)", unique=True),
+        add_index("tags", "tags_name", "`member`, `name`(100)", unique=True),
+        add_index("shop_items", "shop_items_name", "`server`, `name`(100)", unique=True),
+        add_index("ranks", "ranks_role", "`server`, `role`", unique=True),
+        add_index("rm_ignore", "rm_ignore_model", "`server`, `model`", unique=True),
+        add_index("twitch", "twitch_user", "`server`, `user_id`", unique=True),
+        add_index("twitch", "twitch_user_id", "`user_id`"),
+        add_index("rm_buffer", "rm_buffer_member", "`server`, `member`"),
+        # duplicated case ids are possible in old data, so these stay non unique
+        add_index("cases", "cases_id", "`server`, `id`"),
+        add_index("cases", "cases_member", "`server`, `member`, `type`"),
+        add_index("cases", "cases_expires", "`type`, `removed`, `expires`"),
+        add_index("story", "story_id", "`server`, `id`"),
+        add_index("story", "story_pick",
+            "`server`, `lang`, `type`(32), `result_type`")
+    ),
+    Migration(
+        3, "cooldown state",
+        create_table("cooldown_state",
+            "`server` bigint", "`member` bigint", "`command` text",
+            "`remaining_uses` bigint", "`reset_at` int"),
+        add_index("cooldown_state", "cooldown_state_member",
+            "`server`, `command`(100), `member`", unique=True),
+        add_index("cooldown_state", "cooldown_state_reset", "`reset_at`")
+    )
+)
@@ -0,0 +1,137 @@
+import re
+import json
+import logging
+
+from collections import deque
+from functools import lru_cache
+from threading import Lock
+from math import ceil
+
+
+_literal_re = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|\b\d+(?:\.\d+)?\b")
+_param_list_re = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_space_re = re.compile(r"\s+")
+
+# kept apart from the error log, its level and handler are set up in __main__
+slow_query_log = logging.getLogger("warden.slow_queries")
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(query: str) -> str:
+    # ids are often formatted right into the sql, so literals are folded into
+    # placeholders to keep one entry per statement instead of one per guild
+    query = query.replace("%s", "?").replace("%%", "%")
+    query = _literal_re.sub("?", query)
+    query = _param_list_re.sub("(?, ...)", query)
+
+    return _space_re.sub(" ", query).strip()
+
+
+def redact_args(args) -> str:
+    if args is None:
+        return ""
+
+    return ", ".join(f"<{type(arg).__name__}>" for arg in args)
+
+
+class StatementStats:
+
+    __slots__ = ("statement", "calls", "total_time", "rows", "samples")
+
+    def __init__(self, statement, max_samples):
+        self.statement = statement
+        self.calls = 0
+        self.total_time = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, elapsed, rows):
+        self.calls += 1
+        self.total_time += elapsed
+        self.rows += rows
+        self.samples.append(elapsed)
+
+    def percentile(self, p):
+        if len(self.samples) == 0:
+            return 0.0
+
+        ordered = sorted(self.samples)
+
+        return ordered[max(ceil(len(ordered) * p / 100) - 1, 0)]
+
+    @property
+    def mean(self):
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def to_dict(self):
+        return {
+            "statement": self.statement,
+            "calls": self.calls,
+            "total_ms": round(self.total_time * 1000, 3),
+            "mean_ms": round(self.mean * 1000, 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "rows": self.rows
+        }
+
+
+class QueryStats:
+
+    sort_keys = ("total", "calls", "mean", "p99", "rows")
+
+    def __init__(self, *, slow_threshold=None, max_samples=1024):
+        self.slow_threshold = slow_threshold
+        self.max_samples = max_samples
+        self.slow_count = 0
+        self._statements = {}
+        self._lock = Lock()
+
+    def record(self, query, elapsed, rows, args=None):
+        statement = normalize_statement(query)
+
+        # statements run on the db worker threads
+        with self._lock:
+            stats = self._statements.get(statement)
+
+            if stats is None:
+                stats = self._statements[statement] = StatementStats(
+                    statement, self.max_samples)
+
+            stats.add(elapsed, rows)
+
+            if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+                self.slow_count += 1
+            else:
+                return
+
+        slow_query_log.warning(f"Slow query {elapsed * 1000:.1f}ms: {statement} ({redact_args(args)})")
+
+    def top(self, count=10, sort="total"):
+        key = {
+            "total": lambda s: s.total_time,
+            "calls": lambda s: s.calls,
+            "mean": lambda s: s.mean,
+            "p99": lambda s: s.percentile(99),
+            "rows": lambda s: s.rows
+        }[sort]
+
+        with self._lock:
+            statements = sorted(self._statements.values(), key=key, reverse=True)
+
+            return [s.to_dict() for s in statements[:count]]
+
+    def export(self, path):
+        with self._lock:
+            data = [s.to_dict() for s in self._statements.values()]
+
+        data.sort(key=lambda s: s["total_ms"], reverse=True)
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"slow_queries": self.slow_count, "statements": data}, f, indent=4)
+
+        return len(data)
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.slow_count = 0
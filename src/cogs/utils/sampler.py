@@ -0,0 +1,96 @@
+import random
+
+from .loading import SharedLoads
+
+
+class SampleSet:
+
+    __slots__ = ("_items", "_index")
+
+    def __init__(self, items=()):
+        self._items = list(dict.fromkeys(items))
+        # item -> position in _items, so removal doesn't scan the list
+        self._index = {item: i for i, item in enumerate(self._items)}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._index
+
+    def add(self, item):
+        if item in self._index:
+            return
+
+        self._index[item] = len(self._items)
+        self._items.append(item)
+
+    def discard(self, item):
+        i = self._index.pop(item, None)
+
+        if i is None:
+            return
+
+        # the last item takes the freed slot
+        last = self._items.pop()
+
+        if i < len(self._items):
+            self._items[i] = last
+            self._index[last] = i
+
+    def choice(self):
+        if len(self._items) == 0:
+            return None
+
+        return random.choice(self._items)
+
+
+class RandomSampler:
+
+    def __init__(self, load):
+        # async key -> rows, read once per key
+        self.load = load
+        self._sets = {}
+        self._loading = SharedLoads()
+
+    async def get(self, key=None) -> SampleSet:
+        sample_set = self._sets.get(key)
+
+        if sample_set is not None:
+            return sample_set
+
+        return await self._loading.run(key, self._load, key)
+
+    async def _load(self, key) -> SampleSet:
+        sample_set = SampleSet(await self.load(key))
+
+        # a change during the read leaves the set to the next get
+        if self._loading.is_current(key):
+            self._sets[key] = sample_set
+
+        return sample_set
+
+    async def choice(self, key=None):
+        return (await self.get(key)).choice()
+
+    def add(self, key, item):
+        sample_set = self._sets.get(key)
+
+        if sample_set is not None:
+            sample_set.add(item)
+        else:
+            self._loading.discard(key)
+
+    def discard(self, key, item):
+        sample_set = self._sets.get(key)
+
+        if sample_set is not None:
+            sample_set.discard(item)
+        else:
+            self._loading.discard(key)
+
+    def invalidate(self, predicate=None):
+        for key in [key for key in (*self._sets, *self._loading)
+                if predicate is None or predicate(key)]:
+            self._sets.pop(key, None)
+            self._loading.discard(key)
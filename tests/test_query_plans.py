@@ -0,0 +1,69 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from cogs.utils.db import DataBase, DbType
+from cogs.utils.migrations import MIGRATIONS
+
+
+# hot per-guild and per-member statements, each must be answered through an index
+HOT_QUERIES = {
+    "leaderboard": (
+        "SELECT `member`, `money`.`cash` + `money`.`bank` FROM `money` "
+        "WHERE `money`.`server` = ? AND `money`.`cash` + `money`.`bank` > 0",
+        (1, )),
+    "account": (
+        "SELECT `cash`, `bank` FROM `money` WHERE `money`.`server` = ? AND `money`.`member` = ?",
+        (1, 2)),
+    "economy stats": (
+        "SELECT SUM(`cash`), SUM(`bank`), COUNT(*) FROM `money` WHERE `money`.`server` = ?",
+        (1, )),
+    "shop": (
+        "SELECT `author`, `buy_count`, `name`, `price`, `description`, `role`, `stock`, "
+        "`message_type`, `message` FROM `shop_items` WHERE `shop_items`.`server` = ?",
+        (1, )),
+    "shop item": (
+        "SELECT `price` FROM `shop_items` WHERE `shop_items`.`server` = ? AND `shop_items`.`name` = ?",
+        (1, "item")),
+    "tag": (
+        "SELECT `content` FROM `tags` WHERE `tags`.`member` = ? AND `tags`.`name` = ?",
+        (1, "tag")),
+    "tag check": (
+        "SELECT `name` FROM `tags` WHERE `tags`.`member` = ? ORDER BY `tags`.`created` LIMIT ? OFFSET ?",
+        (1, 10, 0)),
+    "income": (
+        "SELECT `member`, `amount`, `is_percentage`, `interval`, `seen` FROM `income` "
+        "WHERE `income`.`server` = ?",
+        (1, )),
+    "stories": (
+        "SELECT `id`, `text` FROM `story` WHERE `story`.`server` = ? AND `story`.`lang` = ? "
+        "AND `story`.`type` = ? AND `story`.`result_type` = ?",
+        (1, "en", "work", 0)),
+    "cases": (
+        "SELECT COUNT(*) FROM `cases` WHERE `cases`.`server` = ? AND `cases`.`member` = ?",
+        (1, 2)),
+    "cooldown state": (
+        "SELECT `member`, `remaining_uses`, `reset_at` FROM `cooldown_state` "
+        "WHERE `cooldown_state`.`server` = ? AND `cooldown_state`.`command` = ?",
+        (1, "work"))
+}
+
+
+@pytest.fixture(scope="module")
+def conn():
+    db = DataBase(DbType.SQLite, database=":memory:", threaded=False, query_stats=False)
+    asyncio.run(db.migrate(MIGRATIONS))
+
+    yield db.pool.connections[0].raw
+
+    db.pool.close()
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(conn, name):
+    query, args = HOT_QUERIES[name]
+    plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", args)]
+
+    assert plan, name
+    assert not any(step.startswith("SCAN") for step in plan), f"{name}: {plan}"